@@ -7,12 +7,30 @@ import os
 import hashlib
 import hmac
 import json
+import queue
+import threading
+import time
 from decimal import Decimal
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 from dotenv import load_dotenv
-from db import SessionLocal
+from db import SessionLocal, ReadSessionLocal, ensure_schema, stick_to_primary
 from models import Restaurant, MenuItem, CartItem, User, Order, OrderItem, Feedback, DeliveryFeedback
-from chatbot import chatbot
+from chatbot import get_chatbot
+from pricing import inr_paise, line_total_paise, paise_to_inr, format_inr, load_price_table
+from catalog import (touch, restaurant_version, catalog_version, catalog_etag, select_fields,
+                     restaurants_json, menu_json, stock_json, changes_json, RESTAURANT_FIELDS,
+                     MENU_ITEM_FIELDS, CHANGES_PAGE_SIZE, catalog_cache, version_cache)
+from fragments import FragmentCacheExtension, Deferred, fragment_cache
+from principal import load_principal, forget_user, principal_cache
+import shopping_cart
+import archive
+import http_cache
+import jobs
+import order_status
+import metrics
+import profiler
+import ratelimit
+import logging
 from functools import wraps
 
 # Load environment variables
@@ -22,9 +40,86 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24))
 app.config['SESSION_TYPE'] = 'filesystem'
-
-# Currency conversion rate (USD to INR)
-USD_TO_INR = 83.0
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+app.config['ORDER_STATUS_TOKEN'] = os.getenv('ORDER_STATUS_TOKEN')  # Staff/kitchen status updates
+app.config['PROFILE_DIR'] = os.getenv('PORTKEY_PROFILE_DIR')
+app.config['PROFILE_ENDPOINTS'] = {name for name in os.getenv('PORTKEY_PROFILE_ENDPOINTS', '').split(',') if name}
+app.add_template_filter(format_inr, 'inr')
+app.jinja_env.add_extension(FragmentCacheExtension)
+metrics.init_app(app)  # Installed first so it sees the final response status
+http_cache.init_app(app)
+profiler.init_app(app)
+ratelimit.init_app(app)
+metrics.registry.register_cache('chatbot_intents', lambda: get_chatbot().get_cache_stats())
+metrics.registry.register_cache('chatbot_order_status', lambda: get_chatbot().get_order_status_stats())
+metrics.registry.register_cache('menu_fragments', fragment_cache.stats)
+metrics.registry.register_cache('catalog_payloads', catalog_cache.stats)
+metrics.registry.register_cache('catalog_versions', version_cache.stats)
+metrics.registry.register_cache('cart_counts', shopping_cart.cart_counts.stats)
+metrics.registry.register_cache('principals', principal_cache.stats)
+
+logger = logging.getLogger(__name__)
+
+# Importing this module touches neither the database nor any threads; the
+# startup work below runs on the first request, or up front via create_app()
+_migrated = False
+_started = False
+_start_lock = threading.Lock()
+
+def migrate_once():
+    """Apply pending migrations, once per process; forked workers inherit the master's run."""
+    global _migrated
+    with _start_lock:
+        if not _migrated:
+            ensure_schema()
+            _migrated = True
+
+def start_services():
+    """Apply pending migrations and start the job workers, once per process."""
+    global _started
+    if _started:
+        return
+    migrate_once()
+    with _start_lock:
+        if _started:
+            return
+        # Post-checkout work runs on background workers; set PORTKEY_JOB_WORKERS=0
+        # to leave it to a separate `python jobs.py` process
+        if jobs.WORKERS:
+            jobs.queue.start()
+        _started = True
+
+def warm_up():
+    """Fill the caches a first request would otherwise pay for."""
+    start_services()
+    db = SessionLocal()
+    try:
+        load_price_table(db)
+    finally:
+        db.close()
+    get_chatbot()
+    restaurants_json()
+
+def create_app(warm=None, **config):
+    """Configure and start the application; warms caches if `warm` (default: PORTKEY_WARM_UP)."""
+    app.config.update(config)
+    if warm is None:
+        warm = os.getenv('PORTKEY_WARM_UP', '').lower() in ('1', 'true', 'yes')
+    if warm:
+        warm_up()
+    else:
+        start_services()
+    return app
+
+@app.before_request
+def ensure_started():
+    if not _started:
+        start_services()
+
+@app.before_request
+def route_reads():
+    """Keep a client's reads on the primary for a while after it wrote order data."""
+    stick_to_primary(session.get('read_primary_until', 0.0))
 
 def hash_password(password):
     """Hash a password using SHA-256."""
@@ -37,19 +132,23 @@ def login_required(f):
         if 'user_id' not in session:
             flash('Please login to access this page.', 'info')
             return redirect(url_for('login'))
+        if get_current_user() is None:
+            # The account was deleted since this session logged in
+            session.clear()
+            flash('Please login to access this page.', 'info')
+            return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
 
 def get_current_user():
-    """Get the current logged-in user."""
-    if 'user_id' not in session:
+    """Get the current logged-in user's Principal, looked up once per request."""
+    user_id = session.get('user_id')
+    if not user_id:
         return None
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(id=session['user_id']).first()
-        return user
-    finally:
-        db.close()
+    current = g.get('current_user')
+    if current is None or current[0] != user_id:
+        current = g.current_user = (user_id, load_principal(user_id))
+    return current[1]
 
 def get_session_id():
     """Get or create a session ID for the current user."""
@@ -57,17 +156,47 @@ def get_session_id():
         session['session_id'] = os.urandom(16).hex()
     return session['session_id']
 
+def cart_owner():
+    """(user_id, session_id) owning the current cart; anonymous carts belong to the session."""
+    user_id = session.get('user_id')
+    return user_id, None if user_id else get_session_id()
+
 def get_cart_count():
-    """Get the number of items in the current user's cart."""
-    session_id = session.get('session_id')
-    if not session_id:
+    """Get the number of lines in the current user's cart."""
+    user_id, session_id = session.get('user_id'), session.get('session_id')
+    if not user_id and not session_id:
         return 0
-    db = SessionLocal()
-    try:
-        count = db.query(CartItem).filter_by(session_id=session_id).count()
-        return count
-    finally:
-        db.close()
+
+    def count():
+        db = SessionLocal()
+        try:
+            return db.query(CartItem).filter(shopping_cart.owner_filter(user_id, session_id)).count()
+        finally:
+            db.close()
+    tag = shopping_cart.owner_tag(user_id, session_id)
+    return shopping_cart.cart_counts.get_or_set(tag, count, tags=(tag,))
+
+# Same in every worker and across restarts; set per deploy to retire pages browsers hold
+PAGE_RELEASE = os.getenv('PORTKEY_RELEASE', '')
+
+def restaurant_page_etag(restaurant_id, catalog_version, cart_count):
+    """Build the ETag for a restaurant page from everything that varies in it."""
+    parts = f"{PAGE_RELEASE}:{restaurant_id}:{catalog_version}:{cart_count}:{session.get('user_id')}"
+    return hashlib.sha1(parts.encode()).hexdigest()[:20]
+
+def is_not_modified(etag, last_modified):
+    """Check the request's validators against the page's ETag and Last-Modified."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return bool(request.if_modified_since and request.if_modified_since >= last_modified)
+
+def set_revalidation_headers(response, etag, last_modified):
+    """Mark a per-user page as revalidate-on-every-use with its validators."""
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 def get_cart_total():
     """Calculate the total for the current user's cart in INR."""
@@ -77,17 +206,11 @@ def get_cart_total():
     db = SessionLocal()
     try:
         cart_items = db.query(CartItem).filter_by(session_id=session_id).all()
-        total = sum(item.subtotal for item in cart_items)
-        # Convert to INR
-        total_inr = Decimal(str(total)) * Decimal(str(USD_TO_INR))
-        return total_inr
+        total_paise = sum(line_total_paise(item.unit_price, item.quantity) for item in cart_items)
+        return paise_to_inr(total_paise)
     finally:
         db.close()
 
-def convert_to_inr(usd_amount):
-    """Convert USD to INR."""
-    return float(usd_amount) * USD_TO_INR
-
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """User login page."""
@@ -138,6 +261,7 @@ def register():
             )
             db.add(new_user)
             db.commit()
+            forget_user(new_user.id)  # SQLite may reuse a deleted account's id
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
         finally:
@@ -154,7 +278,7 @@ def logout():
 @app.route('/')
 def index():
     """Home page displaying all restaurants."""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         restaurants = db.query(Restaurant).all()
         cart_count = get_cart_count()
@@ -166,24 +290,43 @@ def index():
 @app.route('/restaurant/<int:restaurant_id>')
 def restaurant(restaurant_id):
     """Display menu for a specific restaurant."""
+    catalog_version, last_modified = restaurant_version(restaurant_id)
+    cart_count = get_cart_count()
+
+    # Pages carrying flash messages are one-off and never revalidated
+    etag = None
+    if '_flashes' not in session:
+        etag = restaurant_page_etag(restaurant_id, catalog_version, cart_count)
+        if is_not_modified(etag, last_modified):
+            return set_revalidation_headers(app.response_class(status=304), etag, last_modified)
+
     db = SessionLocal()
     try:
         restaurant = db.query(Restaurant).filter_by(id=restaurant_id).first()
         if not restaurant:
             flash('Restaurant not found.', 'error')
             return redirect(url_for('index'))
-        
-        menu_items = db.query(MenuItem).filter_by(restaurant_id=restaurant_id).all()
-        cart_count = get_cart_count()
-        
-        # Convert prices to INR for display
-        for item in menu_items:
-            item.price_inr = convert_to_inr(item.price)
-        
-        return render_template('restaurant.html', restaurant=restaurant, menu_items=menu_items, cart_count=cart_count)
+
+        def load_menu_items():
+            menu_items = db.query(MenuItem).filter_by(restaurant_id=restaurant_id).all()
+            # Attach precomputed INR prices for display
+            for item in menu_items:
+                item.price_inr = paise_to_inr(inr_paise(item.price))
+            return menu_items
+
+        # The template caches the menu body per catalog version in a
+        # {% cache %} block, so the menu query only runs on a re-render
+        response = make_response(render_template('restaurant.html', restaurant=restaurant,
+                                                 menu_items=Deferred(load_menu_items),
+                                                 catalog_version=catalog_version,
+                                                 cart_count=cart_count))
     finally:
         db.close()
 
+    if etag:
+        set_revalidation_headers(response, etag, last_modified)
+    return response
+
 @app.route('/cart/add', methods=['POST'])
 def add_to_cart():
     """Add an item to the cart."""
@@ -210,33 +353,17 @@ def add_to_cart():
             flash(f'Only {menu_item.stock_quantity} items available in stock.', 'warning')
             quantity = menu_item.stock_quantity
         
-        user_id = session.get('user_id') if 'user_id' in session else None
-        session_id = get_session_id() if not user_id else None
+        user_id, session_id = cart_owner()
         
-        query = db.query(CartItem).filter_by(menu_item_id=menu_item_id)
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-        else:
-            query = query.filter_by(session_id=session_id)
-        
-        existing_item = query.first()
-        menu_item.stock_quantity -= quantity
-        
-        if existing_item:
-            existing_item.quantity += quantity
-            if existing_item.quantity > 20:
-                existing_item.quantity = 20
-        else:
-            cart_item = CartItem(
-                session_id=session_id,
-                user_id=user_id,
-                menu_item_id=menu_item_id,
-                quantity=quantity,
-                unit_price=menu_item.price
-            )
-            db.add(cart_item)
+        # A conditional stock update, then an UPSERT into the cart line
+        if shopping_cart.reserve_and_add(db, menu_item, quantity, user_id=user_id, session_id=session_id) is None:
+            db.rollback()
+            flash('This item is currently out of stock.', 'error')
+            return redirect(url_for('restaurant', restaurant_id=menu_item.restaurant_id))
         
         db.commit()
+        touch([menu_item.restaurant_id])
+        shopping_cart.forget_cart(user_id, session_id)
         flash(f'Added {menu_item.name} to cart!', 'success')
         return redirect(url_for('restaurant', restaurant_id=menu_item.restaurant_id))
     finally:
@@ -258,18 +385,18 @@ def cart():
             else:
                 cart_items = db.query(CartItem).options(joinedload(CartItem.menu_item)).filter_by(session_id=session_id).all()
         
-        subtotal = sum(item.subtotal for item in cart_items)
-        subtotal_usd = Decimal(str(subtotal))
-        subtotal_inr = subtotal_usd * Decimal(str(USD_TO_INR))
-        
+        # Add INR prices to cart items for display; totals are summed in paise
+        subtotal_paise = 0
+        for item in cart_items:
+            line_paise = line_total_paise(item.unit_price, item.quantity)
+            item.unit_price_inr = paise_to_inr(inr_paise(item.unit_price))
+            item.subtotal_inr = paise_to_inr(line_paise)
+            subtotal_paise += line_paise
+
+        subtotal_inr = paise_to_inr(subtotal_paise)
         tax = Decimal('0.00')
         total_inr = subtotal_inr + tax
         
-        # Add INR prices to cart items for display
-        for item in cart_items:
-            item.unit_price_inr = convert_to_inr(item.unit_price)
-            item.subtotal_inr = convert_to_inr(item.subtotal)
-        
         cart_count = len(cart_items)
         user = get_current_user()
         
@@ -304,8 +431,7 @@ def process_payment():
             return redirect(url_for('cart'))
 
         # Calculate total
-        total_inr = sum(item.subtotal for item in cart_items)
-        total_inr = Decimal(str(total_inr)) * Decimal(str(USD_TO_INR))
+        total_inr = paise_to_inr(sum(line_total_paise(item.unit_price, item.quantity) for item in cart_items))
 
         # Create order
         order = Order(
@@ -332,10 +458,16 @@ def process_payment():
         for item in cart_items:
             db.delete(item)
 
+        # Receipts and other follow-up work run after the response
+        jobs.enqueue(db, 'order_placed', {'order_id': order.id})
         db.commit()
 
         # Store order ID in session for thank you page
         session['last_order_id'] = order.id
+        session['read_primary_until'] = stick_to_primary()
+        shopping_cart.forget_cart(user_id, session_id)
+        if user_id:
+            get_chatbot().forget_order_status(user_id)
 
         flash(f'Payment successful via {payment_method}! Your order has been placed.', 'success')
         return redirect(url_for('thank_you'))
@@ -354,7 +486,7 @@ def thank_you():
     order = None
 
     if order_id:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         try:
             order = db.query(Order).filter_by(id=order_id).first()
         finally:
@@ -382,11 +514,12 @@ def chatbot_endpoint():
         # Get user context for conversation memory
         user_id = session.get('user_id') or session.get('session_id')
 
-        response = chatbot.get_response(user_message, user_id)
+        response = get_chatbot().get_response(user_message, user_id, customer_id=session.get('user_id'))
         return jsonify(response)
 
     except Exception as e:
-        print(f"Chatbot API error: {str(e)}")  # For debugging
+        logger.exception("Chatbot API error")
+        metrics.errors.inc('chatbot_api')
         return jsonify({
             'response': "I'm experiencing some technical difficulties. Please try again in a moment! 🦉",
             'intent': 'error',
@@ -401,14 +534,23 @@ def chatbot_page():
     user = get_current_user()
     return render_template('chatbot.html', cart_count=cart_count, user=user)
 
+def order_history(db, user_id):
+    """A user's orders newest first, including those moved to the archive."""
+    orders = db.query(Order).filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+    # An order being archived is briefly in both places; the main database's copy wins
+    hot_ids = {order.id for order in orders}
+    orders += [order for order in archive.archived_orders(user_id) if order.id not in hot_ids]
+    orders.sort(key=lambda order: order.created_at, reverse=True)
+    return orders
+
 @app.route('/profile')
 @login_required
 def profile():
     """User profile page with order history."""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         user = get_current_user()
-        orders = db.query(Order).filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
+        orders = order_history(db, user.id)
         cart_count = get_cart_count()
         return render_template('profile.html', user=user, orders=orders, cart_count=cart_count)
     finally:
@@ -418,10 +560,12 @@ def profile():
 @login_required
 def order_details(order_id):
     """Display detailed order information."""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         user = get_current_user()
         order = db.query(Order).filter_by(id=order_id, user_id=user.id).first()
+        if not order:
+            order = next(iter(archive.archived_orders(user.id, order_id=order_id)), None)
 
         if not order:
             flash('Order not found.', 'error')
@@ -463,6 +607,7 @@ def submit_feedback(order_id):
             )
             db.add(feedback)
             db.commit()
+            session['read_primary_until'] = stick_to_primary()
 
             flash('Thank you for your feedback!', 'success')
             return redirect(url_for('order_details', order_id=order_id))
@@ -491,14 +636,17 @@ def settings():
                 flash('All password fields are required.', 'error')
             elif new_password != confirm_password:
                 flash('New passwords do not match.', 'error')
-            elif hash_password(current_password) != user.password_hash:
-                flash('Current password is incorrect.', 'error')
             else:
                 db = SessionLocal()
                 try:
-                    user.password_hash = hash_password(new_password)
-                    db.commit()
-                    flash('Password changed successfully!', 'success')
+                    account = db.get(User, user.id)
+                    if hash_password(current_password) != account.password_hash:
+                        flash('Current password is incorrect.', 'error')
+                    else:
+                        account.password_hash = hash_password(new_password)
+                        db.commit()
+                        forget_user(user.id)
+                        flash('Password changed successfully!', 'success')
                 finally:
                     db.close()
 
@@ -522,8 +670,11 @@ def delete_account():
     db = SessionLocal()
     try:
         # Delete user (cascade will handle related records)
-        db.delete(user)
+        db.delete(db.get(User, user.id))
         db.commit()
+        archive.delete_user_orders(user.id)
+        forget_user(user.id)
+        shopping_cart.forget_cart(user.id)
 
         # Clear session
         session.clear()
@@ -532,19 +683,274 @@ def delete_account():
     finally:
         db.close()
 
+# Read-only catalog API for app clients
+@app.route('/api/restaurants')
+def restaurants_api():
+    """API endpoint for the restaurant list, served from the pre-serialized catalog cache."""
+    try:
+        fields = select_fields(request.args.get('fields'), RESTAURANT_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    version, last_modified = catalog_version()
+    etag = catalog_etag('restaurants', version, fields)
+    if is_not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(restaurants_json(fields), mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response
+
+@app.route('/api/restaurants/<int:restaurant_id>/menu')
+def restaurant_menu_api(restaurant_id):
+    """API endpoint for a restaurant's menu, served from the pre-serialized catalog cache."""
+    try:
+        fields = select_fields(request.args.get('fields'), MENU_ITEM_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    version, last_modified = restaurant_version(restaurant_id)
+    etag = catalog_etag(f'menu-{restaurant_id}', version, fields)
+    if is_not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        payload = menu_json(restaurant_id, fields)
+        if payload is None:
+            return jsonify({'error': 'Restaurant not found'}), 404
+        response = app.response_class(payload, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response
+
+@app.route('/api/restaurants/<int:restaurant_id>/stock')
+def restaurant_stock_api(restaurant_id):
+    """API endpoint for live stock counts of a restaurant's menu; the menu endpoint leaves them out."""
+    payload = stock_json(restaurant_id)
+    if payload is None:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    return app.response_class(payload, mimetype='application/json')
+
+@app.route('/api/catalog/changes')
+def catalog_changes_api():
+    """API endpoint returning catalog changes after the client's version (?since=N)."""
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', CHANGES_PAGE_SIZE, type=int), 1000)
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit >= 1'}), 400
+
+    version, last_modified = catalog_version()
+    etag = catalog_etag(f'changes-{since}-{limit}', version, ())
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        payload = changes_json(since, limit)
+        if payload is None:
+            return jsonify({'error': 'Unknown catalog version, please sync the full catalog', 'version': version}), 410
+        response = app.response_class(payload, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response
+
 # API endpoints for order management
+def cart_api_request():
+    """Parse the menu item and quantity of a cart API call; returns (menu_item_id, quantity) or an error response."""
+    data = request.get_json(silent=True) or {}
+    try:
+        menu_item_id = int(request.view_args.get('menu_item_id') or data.get('menu_item_id'))
+        quantity = int(data.get('quantity', 1))
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'menu_item_id and quantity must be integers'}), 400)
+    return (menu_item_id, quantity), None
+
+def change_cart(change):
+    """Run a cart change for the current owner and answer with the changed line and new totals."""
+    parsed, error = cart_api_request()
+    if error:
+        return error
+    menu_item_id, quantity = parsed
+    user_id, session_id = cart_owner()
+    db = SessionLocal()
+    try:
+        menu_item = db.get(MenuItem, menu_item_id)
+        if menu_item is None:
+            return jsonify({'error': 'Menu item not found'}), 404
+        try:
+            line = change(db, menu_item, quantity, user_id, session_id)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except shopping_cart.CartConflict as e:
+            db.rollback()
+            return jsonify({'error': str(e)}), 409
+        cart_lines = shopping_cart.lines(db, user_id, session_id)
+        db.commit()
+        touch([menu_item.restaurant_id])
+        shopping_cart.forget_cart(user_id, session_id)
+        return jsonify({'line': shopping_cart.line_json(menu_item_id, *line) if line else None,
+                        **shopping_cart.totals(cart_lines)})
+    finally:
+        db.close()
+
+def add_cart_line(db, menu_item, quantity, user_id, session_id):
+    quantity = max(1, min(quantity, shopping_cart.MAX_QUANTITY))
+    line = shopping_cart.reserve_and_add(db, menu_item, quantity, user_id=user_id, session_id=session_id)
+    if line is None:
+        raise shopping_cart.CartConflict(f'Only {menu_item.stock_quantity} available in stock')
+    return line
+
+def set_cart_line(db, menu_item, quantity, user_id, session_id):
+    if quantity < 1:
+        return remove_cart_line(db, menu_item, quantity, user_id, session_id)
+    line = shopping_cart.set_quantity(db, menu_item, quantity, user_id=user_id, session_id=session_id)
+    if line is None:
+        raise LookupError('Item is not in the cart')
+    return line
+
+def remove_cart_line(db, menu_item, quantity, user_id, session_id):
+    shopping_cart.remove_item(db, menu_item, user_id=user_id, session_id=session_id)
+    return None
+
+@app.route('/api/cart')
+def cart_api():
+    """API endpoint for the current cart's lines and totals."""
+    user_id, session_id = session.get('user_id'), session.get('session_id')
+    if not user_id and not session_id:
+        return jsonify({'lines': [], **shopping_cart.totals([])})
+    db = SessionLocal()
+    try:
+        cart_lines = shopping_cart.lines(db, user_id, session_id)
+        return jsonify({'lines': cart_lines, **shopping_cart.totals(cart_lines)})
+    finally:
+        db.close()
+
+@app.route('/api/cart/items', methods=['POST'])
+def add_cart_item_api():
+    """API endpoint to add an item ({"menu_item_id", "quantity"}); answers with the line and totals."""
+    return change_cart(add_cart_line)
+
+@app.route('/api/cart/items/<int:menu_item_id>', methods=['PUT'])
+def set_cart_item_api(menu_item_id):
+    """API endpoint to set a line's quantity ({"quantity"}); 0 removes the line."""
+    return change_cart(set_cart_line)
+
+@app.route('/api/cart/items/<int:menu_item_id>', methods=['DELETE'])
+def remove_cart_item_api(menu_item_id):
+    """API endpoint to remove a line; answers with "line": null and the new totals."""
+    return change_cart(remove_cart_line)
+
 @app.route('/api/orders')
 @login_required
 def get_orders_api():
-    """API endpoint to get user's orders."""
-    db = SessionLocal()
+    """API endpoint to get user's orders, including those moved to the archive."""
+    db = ReadSessionLocal()
     try:
         user = get_current_user()
-        orders = db.query(Order).filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
-        return jsonify([order.to_dict() for order in orders])
+        return jsonify([order.to_dict() for order in order_history(db, user.id)])
     finally:
         db.close()
 
+ORDER_EVENTS_HEARTBEAT = 15  # Seconds between keep-alives
+ORDER_EVENTS_MAX_AGE = 600  # Streams end after this long; EventSource reconnects on its own
+# Under gthread each open stream holds a request thread, so serve.py caps them at half the
+# threads; `serve.py --events` runs them on gevent, where the cap is the connection limit
+ORDER_EVENTS_MAX_STREAMS = int(os.getenv('PORTKEY_MAX_EVENT_STREAMS', '2'))
+ORDER_EVENTS_RETRY_AFTER = 30
+order_event_streams = threading.BoundedSemaphore(ORDER_EVENTS_MAX_STREAMS)
+# Reads the primary: a replica lagging past the poll overlap would lose changes
+order_status_poller = order_status.StatusPoller(order_status.broker, SessionLocal)
+
+@app.route('/api/orders/<int:order_id>/events')
+@login_required
+def order_events(order_id):
+    """Server-sent events stream of an order's status changes."""
+    if not order_event_streams.acquire(blocking=False):
+        ratelimit.rejected.inc(request.endpoint, 'overloaded')
+        response = jsonify({'error': 'Too many open order streams, please retry shortly.',
+                            'retry_after': ORDER_EVENTS_RETRY_AFTER})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(ORDER_EVENTS_RETRY_AFTER)
+        return response
+
+    # Subscribe before reading the order so no change falls between the two
+    subscription = order_status.broker.subscribe(order_id)
+    order_status_poller.start()
+
+    def close():
+        order_status.broker.unsubscribe(order_id, subscription)
+        order_event_streams.release()
+
+    try:
+        db = ReadSessionLocal()
+        try:
+            order = db.query(Order).filter_by(id=order_id, user_id=session['user_id']).first()
+            current = order_status.status_event(order) if order else None
+        finally:
+            db.close()
+    except Exception:
+        close()
+        raise
+    if current is None:
+        close()
+        return jsonify({'error': 'Order not found'}), 404
+
+    def stream():
+        deadline = time.monotonic() + ORDER_EVENTS_MAX_AGE
+        status = current['status']
+        yield 'retry: 5000\n' + order_status.format_sse(current)
+        while status not in order_status.FINAL_STATUSES and time.monotonic() < deadline:
+            try:
+                event = subscription.get(timeout=ORDER_EVENTS_HEARTBEAT)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if event['status'] == status:
+                continue  # The poller re-reads recent changes, so repeats are expected
+            status = event['status']
+            yield order_status.format_sse(event)
+
+    response = Response(stream(), mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(close)
+    return response
+
+def change_order_status(order_id, new_status, user_id=None):
+    """Apply a status transition and return a JSON response."""
+    db = SessionLocal()
+    try:
+        query = db.query(Order).filter_by(id=order_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        order = query.first()
+        if not order:
+            return jsonify({'error': 'Order not found'}), 404
+        try:
+            order_status.transition(db, order, new_status)
+        except order_status.InvalidTransition as e:
+            db.rollback()
+            return jsonify({'error': str(e)}), 409
+        db.commit()
+        get_chatbot().forget_order_status(order.user_id)
+        return jsonify(order.to_dict())
+    finally:
+        db.close()
+
+@app.route('/api/orders/<int:order_id>/status', methods=['POST'])
+def update_order_status(order_id):
+    """API endpoint for the kitchen and delivery staff to advance an order."""
+    token = app.config.get('ORDER_STATUS_TOKEN')
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    new_status = (request.get_json(silent=True) or {}).get('status')
+    if not new_status:
+        return jsonify({'error': 'status is required'}), 400
+    return change_order_status(order_id, new_status)
+
+@app.route('/api/orders/<int:order_id>/cancel', methods=['POST'])
+@login_required
+def cancel_order(order_id):
+    """API endpoint for customers to cancel an order the kitchen hasn't finished."""
+    return change_order_status(order_id, 'cancelled', user_id=session['user_id'])
+
 @app.route('/api/feedback', methods=['POST'])
 @login_required
 def submit_feedback_api():
@@ -579,6 +985,7 @@ def submit_feedback_api():
             )
             db.add(feedback)
             db.commit()
+            session['read_primary_until'] = stick_to_primary()
 
             return jsonify({'message': 'Feedback submitted successfully', 'feedback': feedback.to_dict()})
         finally:
@@ -588,4 +995,4 @@ def submit_feedback_api():
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    create_app().run(debug=True, host='0.0.0.0', port=port)
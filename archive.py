@@ -0,0 +1,192 @@
+"""
+Order archive for Portkey app.
+
+Finished orders older than ARCHIVE_AFTER_DAYS move, with their items and
+feedback, out of the main database into one SQLite file per month
+(archive/orders-2025-01.db, ...). Each file holds the same tables and
+indexes as the main database, so archived rows load as ordinary Order
+objects. Orders move in batches: a batch is written to its month files
+first and only then deleted from the main database, so an interrupted run
+leaves copies behind, never gaps, and the next run simply rewrites them.
+Copies are keyed on the order: its rows in the file are replaced as a
+whole, and items and feedback take new ids there, since the main database
+may hand a deleted item or feedback id out again. Readers (order history,
+order pages, the chatbot) prefer the main database's copy of an order
+found in both places.
+
+Each batch locks out other writers until it is deleted (BEGIN IMMEDIATE on
+SQLite, row locks elsewhere), so feedback can't slip in between copy and
+delete. The newest order always stays, so SQLite, which hands out
+max(id) + 1, never gives a new order the id of an archived one.
+
+Run it from cron (or by hand) with:  python archive.py --days 365
+"""
+
+import argparse
+import glob
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, delete, func, select, text
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from db import SessionLocal, ReadSessionLocal
+from models import Base, Order, OrderItem, Feedback, DeliveryFeedback, MenuItem
+from order_status import FINAL_STATUSES
+
+logger = logging.getLogger('portkey.archive')
+
+ARCHIVE_DIR = os.getenv('PORTKEY_ARCHIVE_DIR', 'archive')
+ARCHIVE_AFTER_DAYS = int(os.getenv('PORTKEY_ARCHIVE_AFTER_DAYS', '365'))
+BATCH_SIZE = 500
+
+# Tables that belong to an order and move with it
+CHILD_TABLES = (OrderItem.__table__, Feedback.__table__, DeliveryFeedback.__table__)
+TABLES = (Order.__table__,) + CHILD_TABLES
+
+_sessions = {}  # path -> sessionmaker
+_sessions_lock = threading.Lock()
+
+
+def archive_path(month, directory=None):
+    """Archive file for a 'YYYY-MM' month."""
+    return os.path.join(directory or ARCHIVE_DIR, f'orders-{month}.db')
+
+
+def archive_paths(directory=None):
+    """Every archive file, newest month first."""
+    return sorted(glob.glob(os.path.join(directory or ARCHIVE_DIR, 'orders-*.db')), reverse=True)
+
+
+def archive_session(path):
+    """Session on an archive file, creating the file and its tables on first use."""
+    with _sessions_lock:
+        factory = _sessions.get(path)
+        if factory is None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            engine = create_engine(f'sqlite:///{path}', echo=False)
+            Base.metadata.create_all(bind=engine, tables=TABLES)
+            factory = _sessions[path] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return factory()
+
+
+def _rows(db, table, ids):
+    return [dict(row) for row in db.execute(select(table).where(table.c.order_id.in_(ids))).mappings()]
+
+
+def archive_orders(older_than=None, batch_size=BATCH_SIZE, directory=None, session_factory=SessionLocal):
+    """Move finished orders created before now - `older_than` into the monthly archives.
+
+    Returns how many orders moved. Orders that can still change status stay.
+    """
+    older_than = timedelta(days=ARCHIVE_AFTER_DAYS) if older_than is None else older_than
+    cutoff = datetime.utcnow() - older_than
+    orders_table = Order.__table__
+    moved = 0
+    while True:
+        db = session_factory()
+        try:
+            if db.get_bind().dialect.name == 'sqlite':
+                db.execute(text('BEGIN IMMEDIATE'))
+            newest = select(func.max(Order.id)).scalar_subquery()
+            orders = [dict(row) for row in db.execute(
+                select(orders_table).where(Order.created_at < cutoff, Order.status.in_(FINAL_STATUSES),
+                                           Order.id < newest)
+                .order_by(Order.id).limit(batch_size).with_for_update()).mappings()]
+            if not orders:
+                db.rollback()
+                return moved
+
+            months = {}
+            for order in orders:
+                months.setdefault(order['created_at'].strftime('%Y-%m'), []).append(order)
+            copied = {table: [] for table in TABLES}  # Main database primary keys written to the archive
+            for month, month_orders in sorted(months.items()):
+                ids = [order['id'] for order in month_orders]
+                archive = archive_session(archive_path(month, directory))
+                try:
+                    # Replace whatever an interrupted run left of these orders
+                    for table in CHILD_TABLES:
+                        archive.execute(delete(table).where(table.c.order_id.in_(ids)))
+                    archive.execute(delete(orders_table).where(orders_table.c.id.in_(ids)))
+                    archive.execute(orders_table.insert(), month_orders)
+                    copied[orders_table] += ids
+                    for table in CHILD_TABLES:
+                        rows = _rows(db, table, ids)
+                        if rows:
+                            copied[table] += [row.pop('id') for row in rows]
+                            archive.execute(table.insert(), rows)
+                    archive.commit()
+                finally:
+                    archive.close()
+
+            for table in CHILD_TABLES + (orders_table,):
+                if copied[table]:
+                    db.execute(delete(table).where(table.c.id.in_(copied[table])))
+            db.commit()
+            moved += len(orders)
+            logger.info("Archived %d orders (%d so far)", len(orders), moved)
+        finally:
+            db.close()
+
+
+def archived_orders(user_id, directory=None, order_id=None):
+    """A user's archived orders (or just order `order_id`), newest first, with items and feedback loaded.
+
+    The orders are detached; each item's menu_item is read from the main
+    database, so it shows the item as it is today (or None if it is gone).
+    """
+    orders = []
+    for path in archive_paths(directory):
+        db = archive_session(path)
+        try:
+            query = db.query(Order).options(
+                selectinload(Order.order_items), selectinload(Order.feedback),
+                selectinload(Order.delivery_feedback),
+            ).filter(Order.user_id == user_id)
+            if order_id is not None:
+                query = query.filter(Order.id == order_id)
+            orders += query.order_by(Order.created_at.desc()).all()
+        finally:
+            db.close()
+        if order_id is not None and orders:
+            break
+    if not orders:
+        return orders
+
+    items = [item for order in orders for item in order.order_items]
+    db = ReadSessionLocal()
+    try:
+        menu_items = {menu_item.id: menu_item for menu_item in db.query(MenuItem).options(
+            joinedload(MenuItem.restaurant)).filter(MenuItem.id.in_({item.menu_item_id for item in items}))}
+    finally:
+        db.close()
+    for item in items:
+        set_committed_value(item, 'menu_item', menu_items.get(item.menu_item_id))
+    return orders
+
+
+def delete_user_orders(user_id, directory=None):
+    """Delete a user's archived orders, as deleting the account does for the main database."""
+    for path in archive_paths(directory):
+        db = archive_session(path)
+        try:
+            ids = select(Order.id).where(Order.user_id == user_id)
+            for table in CHILD_TABLES:
+                db.execute(delete(table).where(table.c.order_id.in_(ids)))
+            db.execute(delete(Order.__table__).where(Order.user_id == user_id))
+            db.commit()
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move old finished orders into monthly archive files.')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='Archive orders older than this')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Orders moved per transaction')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='Directory for the archive files')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    count = archive_orders(timedelta(days=args.days), args.batch_size, args.dir)
+    print(f"Archived {count} orders into {args.dir}")
@@ -0,0 +1,262 @@
+"""
+Benchmark suite for the Portkey ordering flow.
+
+Runs in-process against Flask's test client and a temporary SQLite database
+seeded at a configurable scale, so results are reproducible and need no
+running server. Reports p50/p95/p99 latency and throughput per scenario and
+can write JSON results to diff across commits:
+
+    python benchmark.py --restaurants 50 --items 20 --users 200 --orders 2000 --output before.json
+    python benchmark.py ... --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+SCENARIOS = ('browse', 'menu_page', 'add_to_cart', 'checkout', 'order_history', 'chatbot')
+CHATBOT_MESSAGES = ('hi', 'menu', 'recommend something', 'how do I order', 'how do I pay',
+                    'where are you located', 'what are your hours', 'bye')
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 5000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Portkey ordering flow in-process.')
+    parser.add_argument('--restaurants', type=int, default=20, help='Number of restaurants to seed')
+    parser.add_argument('--items', type=int, default=15, help='Menu items per restaurant')
+    parser.add_argument('--users', type=int, default=100, help='Number of users to seed')
+    parser.add_argument('--orders', type=int, default=1000, help='Number of historical orders to seed')
+    parser.add_argument('--iterations', type=int, default=200, help='Measured operations per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured operations per scenario')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent clients per scenario')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request mix')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated scenarios to run')
+    parser.add_argument('--database', help='Use this SQLite file instead of a fresh temporary one')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Compare against a previous JSON results file')
+    return parser.parse_args(argv)
+
+
+def seed_database(engine, args):
+    """Seed the benchmark database with the synthetic data generator."""
+    from sqlalchemy import update
+    from app import hash_password
+    from models import MenuItem
+    import synthetic
+
+    synthetic.generate(engine, restaurants=args.restaurants, items_per_restaurant=args.items,
+                       users=args.users, orders=args.orders, seed=args.seed, batch_size=BATCH_SIZE,
+                       username_prefix='bench', password_hash=hash_password(BENCH_PASSWORD))
+    # Scenarios add random items to carts, so none may run out or be unavailable
+    with engine.begin() as conn:
+        conn.execute(update(MenuItem).values(availability=True, stock_quantity=1_000_000))
+
+
+class ScenarioContext:
+    """Per-client state for a scenario run."""
+
+    def __init__(self, app, args, rng):
+        self.client = app.test_client()
+        self.args = args
+        self.rng = rng
+        self.logged_in = False
+
+    def login(self):
+        if not self.logged_in:
+            user_id = self.rng.randint(1, self.args.users)
+            self.client.post('/login', data={'username': f'bench{user_id}', 'password': BENCH_PASSWORD})
+            self.logged_in = True
+
+    def random_restaurant(self):
+        return self.rng.randint(1, self.args.restaurants)
+
+    def random_item(self):
+        return self.rng.randint(1, self.args.restaurants * self.args.items)
+
+
+def run_browse(ctx):
+    responses = [ctx.client.get('/api/restaurants')]
+    responses.append(ctx.client.get(f'/api/restaurants/{ctx.random_restaurant()}/menu'))
+    return responses
+
+
+def run_menu_page(ctx):
+    return [ctx.client.get(f'/restaurant/{ctx.random_restaurant()}')]
+
+
+def run_add_to_cart(ctx):
+    return [ctx.client.post('/cart/add', data={'menu_item_id': ctx.random_item(), 'quantity': 1})]
+
+
+def run_checkout(ctx):
+    ctx.login()
+    responses = [ctx.client.post('/cart/add', data={'menu_item_id': ctx.random_item(), 'quantity': 2})]
+    responses.append(ctx.client.post('/process-payment', data={'payment_method': 'Benchmark'}))
+    return responses
+
+
+def run_order_history(ctx):
+    ctx.login()
+    return [ctx.client.get('/api/orders')]
+
+
+def run_chatbot(ctx):
+    return [ctx.client.post('/api/chatbot', json={'message': ctx.rng.choice(CHATBOT_MESSAGES)})]
+
+
+RUNNERS = {
+    'browse': run_browse,
+    'menu_page': run_menu_page,
+    'add_to_cart': run_add_to_cart,
+    'checkout': run_checkout,
+    'order_history': run_order_history,
+    'chatbot': run_chatbot,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(app, name, args):
+    """Run one scenario and summarize its latencies."""
+    runner = RUNNERS[name]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = max(1, args.iterations // args.threads)
+
+    def worker(thread_index):
+        ctx = ScenarioContext(app, args, random.Random(f'{args.seed}-{name}-{thread_index}'))
+        for _ in range(args.warmup):
+            runner(ctx)
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            responses = runner(ctx)
+            local.append(time.perf_counter() - start)
+            failed = [r.status_code for r in responses if r.status_code >= 400]
+            if failed:
+                with lock:
+                    errors.extend(failed)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'operations': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_ops': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'scenario':<15}{'ops':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for name, stats in results['scenarios'].items():
+        line = (f"{name:<15}{stats['operations']:>7}{stats['errors']:>6}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['throughput_ops']:>10.1f}")
+        old = (baseline or {}).get('scenarios', {}).get(name)
+        if old and old.get('p95_ms'):
+            line += f"   p95 {(stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.1f}%"
+        print(line)
+    for name, reason in results.get('skipped', {}).items():
+        print(f"{name:<15}skipped: {reason}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Point the app at the benchmark database before it is imported
+    workdir = tempfile.mkdtemp(prefix='portkey-bench-')
+    database = args.database or os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ.setdefault('PORTKEY_PROFILE_DIR', os.path.join(workdir, 'profiles'))
+
+    from db import engine, ensure_schema
+    from app import app
+    # Benchmark clients hammer the hot endpoints on purpose; measure the app, not the limiter
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    if not args.database:
+        print(f"🌱 Seeding {args.restaurants} restaurants × {args.items} items, "
+              f"{args.users} users, {args.orders} orders...")
+        seed_started = time.perf_counter()
+        ensure_schema()
+        seed_database(engine, args)
+        print(f"   done in {time.perf_counter() - seed_started:.1f}s")
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'scale': {'restaurants': args.restaurants, 'items': args.items,
+                      'users': args.users, 'orders': args.orders},
+            'iterations': args.iterations, 'warmup': args.warmup,
+            'threads': args.threads, 'seed': args.seed,
+        },
+        'scenarios': {},
+        'skipped': {},
+    }
+
+    for name in scenarios:
+        if name == 'menu_page' and not os.path.isdir(os.path.join(app.root_path, app.template_folder)):
+            results['skipped'][name] = 'templates folder not found'
+            continue
+        print(f"⏱️  {name}...")
+        results['scenarios'][name] = run_scenario(app, name, args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print()
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results written to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+"""
+Tiered cache for Portkey app.
+
+Every cache is a namespace with an in-process LRU tier, optionally backed by
+a shared tier that all workers see. The shared tier is a SQLite file (set
+PORTKEY_CACHE_DB) or, in tests, an in-memory stand-in. A lookup that misses
+both tiers goes through get_or_set(): one caller per key runs the loader
+while concurrent callers wait for its result (single-flight), so an expired
+hot key costs one query instead of one per request.
+
+Entries can carry tags, and invalidate(tag) retires every entry stored under
+a tag in any namespace. Tags are versioned: an entry remembers its tags'
+versions from before its value was loaded, and it is ignored once any of
+them moves on. This process sees an invalidation at once; other workers see
+it within TAG_TTL seconds.
+
+The shared tier is best effort: if the SQLite file can't be read or written
+(say it is locked for too long), the error is logged and the cache carries on
+with its local tier, treating entries with tags as stale.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger('portkey.cache')
+
+SHARED_DB = os.getenv('PORTKEY_CACHE_DB')
+TAG_TTL = 1.0  # Seconds a worker reuses a looked-up tag version
+
+_MISSING = object()
+
+
+class MemoryStore:
+    """Shared tier stand-in for one process; also holds tag versions when no file is configured."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> (expires, tag versions, value)
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+
+_sqlite_stores = weakref.WeakSet()
+
+
+class SQLiteStore:
+    """Shared tier in a SQLite file, seen by every worker on the host.
+
+    The file is opened on first use, never at import, and each thread of each
+    process gets its own connection: a forked worker drops the ones it inherits.
+    """
+
+    def __init__(self, path, cleanup_interval=600):
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        self._ready = False
+        _sqlite_stores.add(self)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            if not self._ready:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, expires REAL, '
+                             'entry BLOB NOT NULL)')
+                conn.execute('CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def _after_fork(self):
+        self._local = threading.local()
+
+    def get(self, key):
+        row = self._connect().execute('SELECT entry FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, expires, entry) VALUES (?, ?, ?)',
+                     (key, entry[0], pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)))
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + self.cleanup_interval
+            conn.execute('DELETE FROM cache_entries WHERE expires < ?', (now,))
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def clear(self, prefix):
+        self._connect().execute('DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+
+    def tag_versions(self, tags):
+        tags = list(tags)
+        rows = self._connect().execute(
+            f"SELECT tag, version FROM cache_tags WHERE tag IN ({', '.join('?' * len(tags))})", tags)
+        return dict.fromkeys(tags, 0) | dict(rows.fetchall())
+
+    def bump(self, tags):
+        self._connect().executemany('INSERT INTO cache_tags (tag, version) VALUES (?, 1) '
+                                    'ON CONFLICT(tag) DO UPDATE SET version = version + 1', [(tag,) for tag in tags])
+
+
+def _reset_after_fork():
+    for store in list(_sqlite_stores):
+        store._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):  # Not on Windows, which doesn't fork
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+shared_store = SQLiteStore(SHARED_DB) if SHARED_DB else None
+_tag_store = shared_store or MemoryStore()
+_tag_versions = {}  # tag -> (checked, version)
+_tag_lock = threading.Lock()
+
+
+class _Unknown:
+    """Version of a tag that couldn't be read; equal to nothing, so entries under it are stale."""
+
+    def __eq__(self, other):
+        return False
+
+    __hash__ = object.__hash__
+
+
+def _shared_failed(action):
+    logger.warning("Shared cache %s failed; using the local tier", action, exc_info=True)
+
+
+def tag_versions(tags):
+    """Current version of each tag, re-read from the tag store every TAG_TTL seconds."""
+    now = time.monotonic()
+    versions, stale = {}, []
+    for tag in tags:
+        known = _tag_versions.get(tag)
+        if known and now - known[0] < TAG_TTL:
+            versions[tag] = known[1]
+        else:
+            stale.append(tag)
+    if stale:
+        try:
+            fresh = _tag_store.tag_versions(stale)
+        except sqlite3.Error:
+            _shared_failed('tag lookup')
+            versions.update((tag, _Unknown()) for tag in stale)
+            return versions
+        with _tag_lock:
+            if len(_tag_versions) > 100000:
+                _tag_versions.clear()
+            for tag, version in fresh.items():
+                _tag_versions[tag] = (now, version)
+        versions.update(fresh)
+    return versions
+
+
+def invalidate(*tags):
+    """Retire every cached entry stored under any of `tags`, in every namespace.
+
+    Never raises: callers invalidate after their own commit, which stands
+    either way. If the tag store fails, other workers keep their entries
+    until these expire.
+    """
+    try:
+        _tag_store.bump(tags)
+    except sqlite3.Error:
+        _shared_failed('invalidation')
+    with _tag_lock:
+        for tag in tags:
+            _tag_versions.pop(tag, None)
+
+
+class _Flight:
+    """A load in progress that other callers of the same key wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Cache:
+    """One cache namespace: a bounded LRU tier in front of an optional shared tier.
+
+    `shared` is a store, or True to use the PORTKEY_CACHE_DB store when one is
+    configured. Shared values must be picklable.
+    """
+
+    def __init__(self, namespace, max_size=1024, ttl=None, shared=False):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared_store if shared is True else shared or None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()  # key -> (expires, tag versions, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _shared_key(self, key):
+        return f'{self.namespace}:{key!r}'
+
+    @staticmethod
+    def _is_fresh(entry, now):
+        expires, versions, _ = entry
+        if expires is not None and expires <= now:
+            return False
+        return not versions or tag_versions(versions) == versions
+
+    def _get_local(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if not self._is_fresh(entry, now):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return _MISSING
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry[2]
+
+    def _set_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Get a cached value from the nearest tier holding a fresh copy, or `default`."""
+        now = time.time()
+        value = self._get_local(key, now)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(self._shared_key(key))
+            except sqlite3.Error:
+                _shared_failed('read')
+                entry = None
+            if entry is not None and self._is_fresh(entry, now):
+                self._set_local(key, entry)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return entry[2]
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None, tags=(), versions=None):
+        """Store a value in both tiers; `versions` are the tags' versions from before it was loaded."""
+        ttl = self.ttl if ttl is None else ttl
+        if versions is None:
+            versions = tag_versions(tags) if tags else {}
+        entry = (time.time() + ttl if ttl is not None else None, versions, value)
+        self._set_local(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(key), entry)
+            except sqlite3.Error:
+                _shared_failed('write')
+
+    def get_or_set(self, key, loader, ttl=None, tags=()):
+        """Get a cached value, or load it once while concurrent callers for the key wait."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Read versions first, so an invalidation during the load retires the result
+            versions = tag_versions(tags) if tags else {}
+            flight.value = loader()
+            with self._lock:
+                self.loads += 1
+            self.set(key, flight.value, ttl, versions=versions)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def delete(self, key):
+        """Drop one key from both tiers."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self._shared_key(key))
+            except sqlite3.Error:
+                _shared_failed('delete')
+
+    def clear(self):
+        """Drop every entry in this namespace."""
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            try:
+                self.shared.clear(f'{self.namespace}:')
+            except sqlite3.Error:
+                _shared_failed('clear')
+
+    def __contains__(self, key):
+        return self._get_local(key, time.time()) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Get statistics for this namespace."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits,
+                    'shared_hits': self.shared_hits, 'misses': self.misses, 'loads': self.loads,
+                    'coalesced': self.coalesced, 'hit_ratio': self.hits / total if total else 0.0}
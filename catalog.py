@@ -0,0 +1,314 @@
+"""Catalog versioning and caching for Portkey app - tracks when restaurants and their menus change."""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, event, func, inspect, insert, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from db import SessionLocal
+from cache import Cache
+from models import Restaurant, MenuItem, CatalogChange
+from pricing import inr_paise
+
+# Start time of this process; used as Last-Modified until something changes
+BOOT_TIME = datetime.now(timezone.utc).replace(microsecond=0)
+
+# Versions come from the shared change log; a worker reuses a looked-up
+# version for this many seconds before checking for other workers' writes
+VERSION_TTL = 1.0
+MAX_CACHED_VERSIONS = 10000
+CHANGES_PAGE_SIZE = 500
+CHANGE_RETENTION = timedelta(days=30)  # Change log rows kept for incremental sync
+
+# restaurant_id (None for the whole catalog) -> (version, last_modified); local to
+# each worker, since it is how a worker notices the others' writes
+version_cache = Cache('catalog_versions', max_size=MAX_CACHED_VERSIONS, ttl=VERSION_TTL)
+
+# Pre-serialized JSON payloads keyed by scope, version and selected fields
+catalog_cache = Cache('catalog_payloads', max_size=512, shared=True)
+
+RESTAURANT_FIELDS = ('id', 'name', 'address', 'contact', 'operating_hours', 'cuisine_type', 'menu_count')
+# No stock_quantity: counts change on every cart add, so stock_json() serves them uncached
+MENU_ITEM_FIELDS = ('id', 'restaurant_id', 'name', 'description', 'price', 'price_inr_paise', 'category',
+                    'availability', 'is_in_stock', 'restaurant_name')
+
+
+def _load_version(db, restaurant_id):
+    """Read (version, last_modified) from the change log."""
+    query = db.query(CatalogChange.id, CatalogChange.changed_at)
+    if restaurant_id is not None:
+        query = query.filter(CatalogChange.restaurant_id == restaurant_id)
+    row = query.order_by(CatalogChange.id.desc()).first()
+    if row is None:
+        return 0, BOOT_TIME
+    return row.id, row.changed_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _version(restaurant_id, db=None):
+    if db is not None:
+        return _load_version(db, restaurant_id)
+
+    def load():
+        db = SessionLocal()
+        try:
+            return _load_version(db, restaurant_id)
+        finally:
+            db.close()
+    return version_cache.get_or_set(restaurant_id, load)
+
+
+def restaurant_version(restaurant_id, db=None):
+    """Get (version, last_modified) for a restaurant's catalog entry."""
+    return _version(restaurant_id, db)
+
+
+def catalog_version(db=None):
+    """Get (version, last_modified) for the catalog as a whole."""
+    return _version(None, db)
+
+
+def touch(restaurant_ids):
+    """Forget cached versions so the next lookup sees a just-committed change."""
+    for restaurant_id in restaurant_ids:
+        version_cache.delete(restaurant_id)
+    version_cache.delete(None)
+
+
+def log_changes(connection, changes):
+    """Append (entity, entity_id, restaurant_id, operation) rows to the change log.
+
+    Runs on the caller's connection so the entries commit or roll back with
+    the change itself. Callers that bypass the ORM must log their own changes
+    and call touch() after committing.
+    """
+    if changes:
+        now = datetime.utcnow()
+        connection.execute(insert(CatalogChange), [
+            {'entity': entity, 'entity_id': entity_id, 'restaurant_id': restaurant_id,
+             'operation': operation, 'changed_at': now}
+            for entity, entity_id, restaurant_id, operation in changes
+        ])
+
+
+def _stock_count_only(item):
+    """Whether a menu item's only change is a stock count that stays on the same side of zero.
+
+    Carts move stock on every add, so those changes don't make a new catalog
+    version: versioned payloads carry only is_in_stock, which changes exactly
+    when an item sells out or comes back, and stock_json() serves the counts.
+    """
+    state = inspect(item)
+    if {attr.key for attr in state.attrs if attr.history.has_changes()} != {'stock_quantity'}:
+        return False
+    before = state.attrs.stock_quantity.history.deleted
+    return bool(before) and before[0] is not None and (before[0] > 0) == (item.stock_quantity > 0)
+
+
+def _flushed_changes(session):
+    """Collect change log rows for restaurants and menu items in this flush."""
+    changes = []
+    # session.dirty is a new set on every access, so mark it rather than compare
+    for operation, dirty, objects in (('upsert', False, session.new), ('upsert', True, session.dirty),
+                                      ('delete', False, session.deleted)):
+        for obj in objects:
+            if dirty and not session.is_modified(obj):
+                continue
+            if isinstance(obj, Restaurant):
+                changes.append(('restaurant', obj.id, obj.id, operation))
+            elif isinstance(obj, MenuItem):
+                if dirty and _stock_count_only(obj):
+                    continue
+                changes.append(('menu_item', obj.id, obj.restaurant_id, operation))
+    return changes
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_catalog_changes(session, flush_context):
+    """Log catalog changes in the flushing transaction."""
+    changes = _flushed_changes(session)
+    if changes:
+        log_changes(session.connection(), changes)
+        session.info.setdefault('catalog_changes', set()).update(change[2] for change in changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_catalog_changes(session):
+    """Expire cached versions of restaurants changed by the committed transaction."""
+    changed = session.info.pop('catalog_changes', None)
+    if changed:
+        touch(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_changes(session):
+    """Forget changes from a rolled back transaction."""
+    session.info.pop('catalog_changes', None)
+
+
+def select_fields(requested, allowed):
+    """Parse a comma separated ?fields= value; all fields when it is empty."""
+    if not requested:
+        return allowed
+    names = {name.strip() for name in requested.split(',') if name.strip()}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in names)
+
+
+def catalog_etag(scope, version, fields):
+    """Build the ETag for a catalog payload."""
+    parts = f"{scope}:{version}:{','.join(fields)}"
+    return hashlib.sha1(parts.encode()).hexdigest()[:20]
+
+
+def _dump(payload):
+    """Serialize a payload to compact UTF-8 JSON bytes."""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _pick(data, fields):
+    return {name: data[name] for name in fields}
+
+
+def _menu_item_data(item):
+    """Serialize a menu item for the catalog API, including its INR price."""
+    data = item.to_dict()
+    data['price_inr_paise'] = inr_paise(item.price)
+    del data['stock_quantity']  # Not versioned; see stock_json()
+    return data
+
+
+def restaurants_json(fields=RESTAURANT_FIELDS):
+    """Get the serialized restaurant list, building it only once per catalog version."""
+    version, _ = catalog_version()
+
+    def load():
+        db = SessionLocal()
+        try:
+            restaurants = db.query(Restaurant).options(selectinload(Restaurant.menu_items)).order_by(Restaurant.id).all()
+            return _dump({
+                'version': version,
+                'restaurants': [_pick(restaurant.to_dict(), fields) for restaurant in restaurants]
+            })
+        finally:
+            db.close()
+    return catalog_cache.get_or_set(('restaurants', version, fields), load)
+
+
+def menu_json(restaurant_id, fields=MENU_ITEM_FIELDS):
+    """Get the serialized menu of a restaurant, or None if the restaurant does not exist."""
+    version, _ = restaurant_version(restaurant_id)
+
+    def load():
+        db = SessionLocal()
+        try:
+            if not db.query(Restaurant.id).filter_by(id=restaurant_id).first():
+                return None  # Cached too: adding the restaurant bumps its version
+            menu_items = db.query(MenuItem).options(joinedload(MenuItem.restaurant)).filter_by(
+                restaurant_id=restaurant_id).order_by(MenuItem.id).all()
+            items = [_pick(_menu_item_data(item), fields) for item in menu_items]
+            return _dump({'restaurant_id': restaurant_id, 'version': version, 'items': items})
+        finally:
+            db.close()
+    return catalog_cache.get_or_set(('menu', restaurant_id, version, fields), load)
+
+
+def stock_json(restaurant_id):
+    """Get the live stock counts of a restaurant's menu, or None if the restaurant does not exist.
+
+    Never cached: counts aren't part of catalog versions, so a cached copy
+    would have nothing to retire it.
+    """
+    db = SessionLocal()
+    try:
+        if not db.query(Restaurant.id).filter_by(id=restaurant_id).first():
+            return None
+        rows = db.query(MenuItem.id, MenuItem.stock_quantity).filter_by(
+            restaurant_id=restaurant_id).order_by(MenuItem.id)
+        return _dump({'restaurant_id': restaurant_id,
+                      'items': [{'id': item_id, 'stock_quantity': stock} for item_id, stock in rows]})
+    finally:
+        db.close()
+
+
+def _pruned_through(db):
+    """Highest version whose changes may have been pruned (0 if none were)."""
+    return db.query(func.max(CatalogChange.entity_id)).filter(
+        CatalogChange.entity == 'catalog', CatalogChange.operation == 'prune').scalar() or 0
+
+
+def prune_changes(older_than=CHANGE_RETENTION, session_factory=SessionLocal):
+    """Delete change log rows older than `older_than`; returns how many were deleted.
+
+    Each restaurant's latest row stays, since it is the restaurant's version.
+    A ('catalog', version, 'prune') row records how far the log was pruned, so
+    changes_since() turns away clients synced before that.
+    """
+    db = session_factory()
+    try:
+        horizon = db.query(func.max(CatalogChange.id)).filter(
+            CatalogChange.changed_at < datetime.utcnow() - older_than).scalar()
+        if horizon is None:
+            return 0
+        latest = select(func.max(CatalogChange.id)).group_by(CatalogChange.restaurant_id)
+        deleted = db.execute(delete(CatalogChange).where(
+            CatalogChange.id <= horizon, CatalogChange.id.not_in(latest))).rowcount
+        if deleted:
+            log_changes(db.connection(), [('catalog', horizon, 0, 'prune')])
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+def changes_since(since, limit=CHANGES_PAGE_SIZE):
+    """Get the catalog delta after version `since`, or None if `since` is unknown or pruned."""
+    db = SessionLocal()
+    try:
+        current, _ = catalog_version(db)
+        if since > current or since < _pruned_through(db):
+            return None
+
+        changes = db.query(CatalogChange).filter(CatalogChange.id > since).order_by(CatalogChange.id).limit(limit + 1).all()
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Only the last operation on each entity matters
+        latest = {}
+        for change in changes:
+            latest[(change.entity, change.entity_id)] = change.operation
+
+        def ids(entity, operation):
+            return sorted(key[1] for key, op in latest.items() if key[0] == entity and op == operation)
+
+        restaurants = db.query(Restaurant).options(selectinload(Restaurant.menu_items)).filter(
+            Restaurant.id.in_(ids('restaurant', 'upsert'))).order_by(Restaurant.id).all()
+        menu_items = db.query(MenuItem).options(joinedload(MenuItem.restaurant)).filter(
+            MenuItem.id.in_(ids('menu_item', 'upsert'))).order_by(MenuItem.id).all()
+
+        # Entities logged as upserts that no longer exist were deleted later on
+        found_restaurants = {restaurant.id for restaurant in restaurants}
+        found_items = {item.id for item in menu_items}
+        deleted_restaurants = set(ids('restaurant', 'delete')) | (set(ids('restaurant', 'upsert')) - found_restaurants)
+        deleted_items = set(ids('menu_item', 'delete')) | (set(ids('menu_item', 'upsert')) - found_items)
+
+        return {
+            'since': since,
+            'version': changes[-1].id if changes else current,
+            'has_more': has_more,
+            'restaurants': [restaurant.to_dict() for restaurant in restaurants],
+            'menu_items': [_menu_item_data(item) for item in menu_items],
+            'deleted': {
+                'restaurants': sorted(deleted_restaurants),
+                'menu_items': sorted(deleted_items)
+            }
+        }
+    finally:
+        db.close()
+
+
+def changes_json(since, limit=CHANGES_PAGE_SIZE):
+    """Serialized form of changes_since()."""
+    delta = changes_since(since, limit)
+    return None if delta is None else _dump(delta)
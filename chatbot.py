@@ -7,16 +7,55 @@ Enhanced with better pattern matching, conversation flow, and human-like interac
 import re
 import random
 import time
+import logging
+import threading
 from datetime import datetime
-from db import SessionLocal
-from models import Restaurant, MenuItem
+from db import ReadSessionLocal
+from models import Restaurant, MenuItem, Order
+from pricing import inr_paise, paise_to_inr
+import archive
+import cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUS_MESSAGES = {
+    'confirmed': "is confirmed and waiting for the kitchen ✅",
+    'preparing': "is being prepared right now 👨‍🍳",
+    'ready': "is ready and waiting for a delivery partner 📦",
+    'out_for_delivery': "is out for delivery and on its way to you 🛵",
+    'delivered': "was delivered. Enjoy your meal! 🍽️",
+    'cancelled': "was cancelled. Any payment will be refunded to the original method.",
+}
+# An order number needs a marker (#12, order no. 12, my order 12), unlike "order 2 pizzas"
+ORDER_NUMBER_PATTERN = re.compile(r'(?:\border\s*(?:no\.?|number)\s*#?|#|\b(?:my|track|tracking|of) order\s+)(\d+)')
+
+def order_status_tag(customer_id):
+    """Cache tag for everything derived from a customer's orders."""
+    return f'orders:{customer_id}'
 
 class Chatbot:
     """Hedwig chatbot for food delivery assistance with enhanced conversation capabilities."""
 
-    def __init__(self):
+    def __init__(self, intent_cache_size=512):
         """Initialize chatbot with intents, database connection, and conversation memory."""
         self.intents = {
+            'order_status': {
+                'patterns': [
+                    r'\b(where|track|status|when)\b.*\bmy (order|food|delivery)\b',
+                    r'\b(order|delivery) status\b',
+                    r'\btrack(ing)?\b.*\border\b',
+                    r'\bmy (order|food|delivery) (is )?(late|delayed)\b',
+                    # Needs a marker: "order 2 pizzas" is ordering, not order #2
+                    r'\border\s*(no\.?|number|#)\s*#?\d+',
+                    r'\bmy order\s+\d+'
+                ],
+                'responses': [
+                    "Let me check on that for you! 🦉",
+                    "Looking up your order now! 🔍",
+                    "Good question, let me take a peek at your order! 👀"
+                ]
+            },
             'greetings': {
                 'patterns': [
                     r'\b(hi|hello|hey|good morning|good afternoon|good evening|morning|afternoon|evening)\b',
@@ -213,10 +252,18 @@ class Chatbot:
         self.conversation_memory = {}
         self.max_memory_items = 5
 
+        # Bounded LRU cache of normalized message -> intent name
+        self.intent_cache = cache.Cache('chatbot_intents', max_size=intent_cache_size)
+        self.intent_cache_max_length = 200  # Long messages are rarely repeated
+
+        # Short-lived per-user cache of order status answers, keyed by (user, order number)
+        # and tagged per user so any worker's order change retires them
+        self.order_status_cache = cache.Cache('chatbot_order_status', max_size=4096, ttl=5.0, shared=True)
+
     def get_restaurants_info(self):
         """Get formatted list of restaurants from database."""
         try:
-            db = SessionLocal()
+            db = ReadSessionLocal()
             restaurants = db.query(Restaurant).all()
             db.close()
 
@@ -239,7 +286,7 @@ class Chatbot:
         """Get sample of popular menu items."""
         try:
             from sqlalchemy.orm import joinedload
-            db = SessionLocal()
+            db = ReadSessionLocal()
             # Get some popular items from different categories with restaurant info
             items = db.query(MenuItem).options(joinedload(MenuItem.restaurant)).filter(
                 MenuItem.availability == True,
@@ -252,7 +299,7 @@ class Chatbot:
 
             response = "🍕 **Popular Menu Items:**\n\n"
             for item in items:
-                price_inr = float(item.price) * 83.0  # Convert to INR
+                price_inr = paise_to_inr(inr_paise(item.price))
                 response += f"🍽️ **{item.name}**\n"
                 response += f"   📝 {item.description}\n"
                 response += f"   💰 ₹{price_inr:.0f} ({item.category})\n"
@@ -262,6 +309,46 @@ class Chatbot:
         except Exception as e:
             return "Sorry, I'm having trouble accessing menu information right now."
 
+    def get_order_status(self, customer_id, order_id=None):
+        """Describe the status of the customer's latest order, or of order `order_id`."""
+        if not customer_id:
+            return "Please log in so I can look up your orders! 🔐"
+
+        def load():
+            db = ReadSessionLocal()
+            try:
+                # Served entirely from the (user_id, created_at, status) index
+                query = db.query(Order.id, Order.status, Order.created_at).filter(Order.user_id == customer_id)
+                if order_id is not None:
+                    query = query.filter(Order.id == order_id)
+                order = query.order_by(Order.created_at.desc()).first()
+            finally:
+                db.close()
+            if order is None:
+                # Orders are archived oldest first, so only a miss can be in the archive
+                order = next(iter(archive.archived_orders(customer_id, order_id=order_id)), None)
+
+            if order is None:
+                return (f"I couldn't find order #{order_id} on your account. Please check the number on your profile page."
+                        if order_id is not None else "You haven't placed any orders yet. Hungry? Let me show you our menu! 🍽️")
+            status = ORDER_STATUS_MESSAGES.get(order.status, f"is {order.status.replace('_', ' ')}")
+            return f"📦 Your order #{order.id} (placed {order.created_at:%d %b, %I:%M %p}) {status}"
+
+        try:
+            return self.order_status_cache.get_or_set((customer_id, order_id), load,
+                                                      tags=(order_status_tag(customer_id),))
+        except Exception as e:
+            logger.exception("Order status lookup failed")
+            return "Sorry, I can't reach the order system right now. Please check your profile page for updates."
+
+    def forget_order_status(self, customer_id):
+        """Drop cached order status answers for a customer after their orders change."""
+        cache.invalidate(order_status_tag(customer_id))
+
+    def get_order_status_stats(self):
+        """Get order status cache statistics."""
+        return self.order_status_cache.stats()
+
     def get_recommendations(self):
         """Get food recommendations."""
         recommendations = [
@@ -287,8 +374,35 @@ class Chatbot:
 
         return 'fallback', self.intents['fallback']
 
-    def get_response(self, user_message, user_id=None):
-        """Generate response based on user message with context awareness."""
+    @staticmethod
+    def normalize_message(message):
+        """Normalize a message for intent matching (lowercase, collapsed whitespace)."""
+        return ' '.join(message.lower().split())
+
+    def classify(self, message):
+        """Match intent for a message, reusing the cached result for repeated messages."""
+        key = self.normalize_message(message)
+        if len(key) > self.intent_cache_max_length:
+            return self.match_intent(key)
+
+        intent_name = self.intent_cache.get_or_set(key, lambda: self.match_intent(key)[0])
+        return intent_name, self.intents[intent_name]
+
+    def get_cache_stats(self):
+        """Get intent cache statistics."""
+        return self.intent_cache.stats()
+
+    def clear_intent_cache(self):
+        """Clear cached intent classifications (e.g. after changing intent patterns)."""
+        self.intent_cache.clear()
+
+    def get_response(self, user_message, user_id=None, customer_id=None):
+        """Generate response based on user message with context awareness.
+
+        `user_id` keys the conversation memory (user or anonymous session);
+        `customer_id` is the logged-in user's id, needed for order lookups.
+        """
+        start = time.perf_counter()
         try:
             # Clean and normalize message
             user_message = user_message.strip()
@@ -299,8 +413,8 @@ class Chatbot:
                     'success': True
                 }
 
-            # Match intent
-            intent, intent_data = self.match_intent(user_message)
+            # Match intent (cached for repeated messages)
+            intent, intent_data = self.classify(user_message)
 
             # Get base response
             response = random.choice(intent_data['responses'])
@@ -309,7 +423,11 @@ class Chatbot:
             response = self.add_context_awareness(response, intent, user_id)
 
             # Add specific information based on intent
-            if intent == 'restaurant_query':
+            if intent == 'order_status':
+                match = ORDER_NUMBER_PATTERN.search(user_message.lower())
+                response += "\n\n" + self.get_order_status(customer_id, int(match.group(1)) if match else None)
+
+            elif intent == 'restaurant_query':
                 # Check if follow_up is disabled for this intent
                 if intent_data.get('follow_up', True):
                     response += "\n\n" + self.get_restaurants_info()
@@ -370,6 +488,7 @@ class Chatbot:
 
             # Update conversation memory
             self.update_conversation_memory(user_id, intent, user_message)
+            metrics.chatbot_latency.observe(time.perf_counter() - start, intent)
 
             # Return as JSON for API
             return {
@@ -379,7 +498,8 @@ class Chatbot:
             }
 
         except Exception as e:
-            print(f"Chatbot error: {str(e)}")  # For debugging
+            logger.exception("Chatbot error")
+            metrics.errors.inc('chatbot')
             return {
                 'response': "Sorry, I'm experiencing some technical difficulties. Please try again in a moment! 🦉",
                 'intent': 'error',
@@ -432,5 +552,15 @@ class Chatbot:
         recent = self.conversation_memory[user_id][-count:]
         return [item['intent'] for item in recent]
 
-# Create global chatbot instance
-chatbot = Chatbot()
+# Global chatbot instance, built on first use so importing this module stays cheap
+_chatbot = None
+_chatbot_lock = threading.Lock()
+
+def get_chatbot():
+    """Get the global chatbot, creating it on first call."""
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                _chatbot = Chatbot()
+    return _chatbot
@@ -0,0 +1,23 @@
+import pytest
+
+from models import MenuItem, Restaurant
+
+MENU_ITEM_DEFAULTS = {'name': 'Ghee Roast', 'description': 'Crispy', 'price': 5.0, 'category': 'Main Course',
+                      'availability': True, 'stock_quantity': 100}
+
+@pytest.fixture
+def add_menu_item():
+    """Add a committed menu item, at a Dollops restaurant created on first use; pass only what differs."""
+
+    def add(db, **fields):
+        restaurant = db.query(Restaurant).filter_by(name='Dollops').first()
+        if restaurant is None:
+            restaurant = Restaurant(name='Dollops', address='Manipal', contact='0820', operating_hours='9-5',
+                                    cuisine_type='Indian')
+            db.add(restaurant)
+            db.flush()
+        item = MenuItem(restaurant_id=restaurant.id, **dict(MENU_ITEM_DEFAULTS, **fields))
+        db.add(item)
+        db.commit()
+        return item
+    return add
@@ -1,20 +1,70 @@
 """Database configuration and initialization for Portkey app - REAL MANIPAL & MANGALORE RESTAURANTS."""
 
 import os
-from sqlalchemy import create_engine
+import time
+from contextvars import ContextVar
+from itertools import count
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from models import Base, Restaurant, MenuItem, CartItem, User
+from metrics import instrument_engine
+import migrations
+import slowlog
 
 # Database configuration
-DATABASE_URL = "sqlite:///database.db"
+load_dotenv()
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///database.db')
 engine = create_engine(DATABASE_URL, echo=False)
+instrument_engine(engine)
+slowlog.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replicas (comma separated URLs) for catalog and history reads
+REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# After a write, the writer reads from the primary this long so it sees its own changes
+REPLICA_STICKY_SECONDS = float(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '10'))
+replica_engines = []
+for url in REPLICA_URLS:
+    replica = create_engine(url, echo=False)
+    instrument_engine(replica)
+    slowlog.install(replica)
+    replica_engines.append(replica)
+
+_read_sessions = sessionmaker(autocommit=False, autoflush=False)
+_replica_turn = count()
+_primary_until = ContextVar('primary_until', default=0.0)
+
+@event.listens_for(_read_sessions, 'before_flush')
+def _refuse_writes(session, flush_context, instances):
+    raise RuntimeError("Read sessions may be routed to a replica; use SessionLocal for writes.")
+
+def stick_to_primary(until=None):
+    """Route this context's reads to the primary until `until` (default: now plus the sticky window)."""
+    until = time.time() + REPLICA_STICKY_SECONDS if until is None else until
+    _primary_until.set(until)
+    return until
+
+def read_engine():
+    """Pick the engine for a read: a replica in turn, or the primary while sticky."""
+    if not replica_engines or time.time() < _primary_until.get():
+        return engine
+    return replica_engines[next(_replica_turn) % len(replica_engines)]
+
+def ReadSessionLocal():
+    """Session for read-only work; it refuses to flush changes."""
+    return _read_sessions(bind=read_engine())
+
+def ensure_schema(verbose=False):
+    """Apply pending schema migrations without touching existing data."""
+    return migrations.migrate(engine, verbose=verbose)
+
 def init_db():
-    """Initialize database by creating all tables."""
-    from models import Restaurant, MenuItem, CartItem, User
+    """Recreate all tables from scratch. This deletes every row!"""
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE IF EXISTS schema_version'))
+    migrations.migrate(engine)
     print("Database initialized successfully!")
 
 def seed_db():
@@ -0,0 +1,61 @@
+"""Rendered template fragment cache for Portkey app.
+
+Templates wrap expensive, user-independent blocks in a cache tag:
+
+    {% cache 'restaurant-menu', restaurant.id, catalog_version %}
+        ... menu items ...
+    {% endcache %}
+
+The rendered block is stored under the key parts, so bumping the catalog
+version renders it again while per-user parts of the page stay live.
+"""
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from cache import Cache
+
+# Fragments are keyed by catalog version, so every worker can reuse them
+fragment_cache = Cache('menu_fragments', max_size=256, shared=True)
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension adding the {% cache key, ... %}...{% endcache %} tag."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.List(key_parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        return fragment_cache.get_or_set(tuple(key_parts), caller)
+
+
+class Deferred:
+    """Sequence loaded on first use, so a cached fragment never triggers its query."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._items = None
+
+    def _load(self):
+        if self._items is None:
+            self._items = list(self._loader())
+        return self._items
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+    def __bool__(self):
+        return bool(self._load())
@@ -0,0 +1,135 @@
+"""HTTP caching and compression for Portkey app responses.
+
+Every successful GET response gets a Cache-Control policy for its route and a
+weak ETag (so If-None-Match revalidation returns 304), and bodies above a size
+threshold are gzip or brotli encoded. Static files are compressed once and the
+encoded bytes are kept in memory until the file changes.
+"""
+
+import gzip
+import os
+import threading
+from flask import request
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+# Cache-Control by endpoint; other GET responses without one get DEFAULT_POLICY
+CACHE_POLICIES = {
+    'static': 'public, max-age=604800',
+    'get_orders_api': 'private, no-cache',
+    'order_events': 'private, no-cache, no-transform',
+    'restaurants_api': 'public, no-cache',
+    'restaurant_menu_api': 'public, no-cache',
+    'restaurant_stock_api': 'public, no-store',
+    'catalog_changes_api': 'public, no-cache',
+    'index': 'private, no-cache',
+    'restaurant': 'private, no-cache',
+    'cart': 'private, no-store',
+    'cart_api': 'private, no-store',
+    'thank_you': 'private, no-store',
+    'settings': 'private, no-store',
+}
+DEFAULT_POLICY = 'private, no-cache'
+
+COMPRESS_MIN_SIZE = 1024  # Bytes; smaller bodies are not worth the CPU
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+)
+
+_static_cache = {}  # (path, mtime, size, encoding) -> compressed bytes
+_static_lock = threading.Lock()
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported content coding from the request's Accept-Encoding."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, static=False):
+    """Compress a body with the given coding; static files use the best ratio."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else 5)
+    return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+
+
+def compress_static(path, encoding):
+    """Get compressed bytes for a static file, compressing it only once per version."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+    data = _static_cache.get(key)
+    if data is None:
+        with open(path, 'rb') as f:
+            data = compress(f.read(), encoding, static=True)
+        with _static_lock:
+            # Drop encodings of older versions of the same file
+            for old_key in [k for k in _static_cache if k[0] == path and k[3] == encoding]:
+                del _static_cache[old_key]
+            _static_cache[key] = data
+    return data
+
+
+def is_compressible(response):
+    """Check whether a response body should be compressed."""
+    mimetype = response.mimetype or ''
+    return (response.status_code == 200
+            and 'Content-Encoding' not in response.headers
+            and mimetype.startswith(COMPRESSIBLE_TYPES))
+
+
+def init_app(app):
+    """Install the caching and compression layer on a Flask app."""
+    policies = dict(CACHE_POLICIES, **app.config.get('CACHE_POLICIES', {}))
+    min_size = app.config.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE)
+
+    @app.after_request
+    def cache_and_compress(response):
+        if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+            return response
+
+        # Route policies win; other responses keep their own header or get the default
+        if request.endpoint in policies:
+            response.headers['Cache-Control'] = policies[request.endpoint]
+        elif 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = DEFAULT_POLICY
+
+        # Static files are already conditional; dynamic bodies get a weak ETag of their content
+        is_static = request.endpoint == 'static' and app.static_folder is not None
+        if not is_static and not response.is_streamed:
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+
+        if not is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None or (response.content_length or 0) < min_size:
+            return response
+
+        if is_static:
+            static_path = safe_join(app.static_folder, request.view_args['filename'])
+            data = compress_static(static_path, encoding)
+            if hasattr(response.response, 'close'):
+                response.response.close()
+            response.direct_passthrough = False
+        elif not response.is_streamed:
+            data = compress(response.get_data(), encoding)
+        else:
+            return response
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # The same validator now covers several encodings, so it can only be weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
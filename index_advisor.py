@@ -0,0 +1,137 @@
+"""
+Index advisor for Portkey app.
+
+Replays recorded SQL statements through the query planner and reports which
+index each one uses, which ones scan whole tables or sort in a temp b-tree,
+and which indexes no recorded query touched. Record every statement with the
+slow query log by dropping its threshold:
+
+    PORTKEY_SLOW_QUERY_LOG=queries.jsonl PORTKEY_SLOW_QUERY_MS=0 \\
+    PORTKEY_SLOW_QUERY_MAX_PER_MINUTE=100000 python benchmark.py --database bench.db
+    python index_advisor.py queries.jsonl --database sqlite:///bench.db
+"""
+
+import argparse
+import json
+import os
+import re
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, inspect
+from slowlog import explain
+
+INDEX_PATTERNS = (
+    re.compile(r'USING (?:COVERING )?INDEX (\w+)'),                    # SQLite
+    re.compile(r'USING (INTEGER PRIMARY KEY)'),
+    re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)'),   # Postgres
+    re.compile(r'Bitmap Index Scan on (\w+)'),
+)
+FULL_SCAN_PATTERNS = (
+    re.compile(r'^SCAN (?:TABLE )?(\w+)$'),
+    re.compile(r'Seq Scan on (\w+)'),
+)
+TEMP_SORT_PATTERN = re.compile(r'USE TEMP B-TREE|Sort Key')
+
+
+def load_entries(path):
+    """Read slow query log entries from a JSONL file."""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@contextmanager
+def record(engine):
+    """Collect statements executed through an engine as slow-log style entries."""
+    entries = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        entries.append({'statement': statement,
+                        'parameters': parameters[0] if executemany and parameters else parameters})
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        yield entries
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+
+def summarize_plan(plan):
+    """Pull indexes, full table scans and temp sorts out of plan lines."""
+    indexes, full_scans, temp_sort = [], [], False
+    for line in plan or ():
+        line = line.strip()
+        for pattern in INDEX_PATTERNS:
+            indexes.extend(pattern.findall(line))
+        for pattern in FULL_SCAN_PATTERNS:
+            full_scans.extend(pattern.findall(line))
+        temp_sort = temp_sort or bool(TEMP_SORT_PATTERN.search(line))
+    return {'indexes': indexes, 'full_scans': full_scans, 'temp_sort': temp_sort}
+
+
+def _placeholder_parameters(statement, parameters, dialect_name):
+    """Redacted entries still get a plan; bind NULLs in place of the hidden values."""
+    if parameters != '<redacted>':
+        return parameters
+    if dialect_name == 'sqlite':
+        return [None] * statement.count('?')
+    return {name: None for name in re.findall(r'%\((\w+)\)s', statement)}
+
+
+def analyze(engine, entries):
+    """Explain each distinct statement; returns (per-statement reports, unused indexes)."""
+    statements = {}
+    for entry in entries:
+        key = ' '.join(entry['statement'].split())
+        report = statements.get(key)
+        if report is None:
+            report = statements[key] = {'statement': key, 'count': 0, 'total_ms': 0.0,
+                                        'raw': entry['statement'], 'parameters': entry.get('parameters')}
+        report['count'] += 1
+        report['total_ms'] += entry.get('duration_ms', 0.0)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for report in statements.values():
+            parameters = _placeholder_parameters(report['raw'], report.pop('parameters'), engine.dialect.name)
+            report['plan'] = explain(cursor, engine.dialect.name, report.pop('raw'), parameters)
+            report.update(summarize_plan(report['plan']))
+        cursor.close()
+    finally:
+        raw.close()
+
+    used = {name for report in statements.values() for name in report['indexes']}
+    inspector = inspect(engine)
+    unused = [(table, index['name']) for table in inspector.get_table_names()
+              for index in inspector.get_indexes(table)
+              if not index.get('unique') and index['name'] not in used]
+    reports = sorted(statements.values(), key=lambda report: (-report['total_ms'], -report['count']))
+    return reports, unused
+
+
+def print_report(reports, unused):
+    for report in reports:
+        if report['plan'] is None:
+            continue  # Not explainable (DDL, PRAGMA, ...)
+        flags = []
+        if report['full_scans']:
+            flags.append(f"FULL SCAN {', '.join(report['full_scans'])}")
+        if report['temp_sort']:
+            flags.append('TEMP SORT')
+        print(f"{report['count']:>6}x {report['total_ms']:>10.1f} ms  {report['statement'][:120]}")
+        print(f"        indexes: {', '.join(report['indexes']) or '-'}"
+              + (f"   ⚠️  {'; '.join(flags)}" if flags else ''))
+    if unused:
+        print('\nIndexes no recorded query used (candidates to drop):')
+        for table, name in unused:
+            print(f'   {table}.{name}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report the index used by each recorded query.')
+    parser.add_argument('log', help='JSONL file written by the slow query log (PORTKEY_SLOW_QUERY_LOG)')
+    parser.add_argument('--database', help='Database URL to plan against (default: DATABASE_URL)')
+    args = parser.parse_args()
+    load_dotenv()
+    engine = create_engine(args.database or os.getenv('DATABASE_URL', 'sqlite:///database.db'))
+    print_report(*analyze(engine, load_entries(args.log)))
@@ -0,0 +1,233 @@
+"""
+Background job queue for Portkey app.
+
+Work that doesn't have to finish before the response (receipts,
+recommendation updates, aggregate refreshes) is enqueued as a Job row in the
+same transaction as the change that triggers it, so a job exists exactly when
+its order does. A pool of worker threads claims due jobs, runs the registered
+handler and retries failures with exponential backoff. Claiming is an atomic
+UPDATE, so any number of processes can run workers side by side.
+
+Run workers outside the web process with:  python jobs.py --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, event, or_, update
+from sqlalchemy.orm import Session
+from db import SessionLocal
+from models import Job, Order
+from pricing import format_inr, line_total_paise
+import catalog
+import metrics
+
+logger = logging.getLogger('portkey.jobs')
+
+WORKERS = int(os.getenv('PORTKEY_JOB_WORKERS', '2'))
+POLL_INTERVAL = float(os.getenv('PORTKEY_JOB_POLL_SECONDS', '5'))
+LEASE = timedelta(minutes=5)  # A job running longer is assumed lost and claimed again
+RETRY_BASE_SECONDS = 2
+RETENTION = timedelta(days=7)  # Finished jobs are pruned after this long
+PRUNE_INTERVAL = 3600
+
+jobs_total = metrics.registry.counter(
+    'portkey_jobs_total', 'Background job runs, by outcome.', ('name', 'outcome'))
+job_latency = metrics.registry.histogram(
+    'portkey_job_duration_seconds', 'Time spent running background jobs.', ('name',))
+
+_handlers = {}
+
+
+def task(name):
+    """Register a job handler; it is called with the job payload as keyword arguments."""
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(db, name, payload=None, delay=0, max_attempts=5):
+    """Add a job to the caller's session; workers see it once that session commits."""
+    job = Job(name=name, payload=json.dumps(payload or {}), max_attempts=max_attempts,
+              run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.add(job)
+    db.info['jobs_enqueued'] = True
+    return job
+
+
+def _due(now):
+    """Jobs ready to run: pending and due, or running past their lease."""
+    return or_(and_(Job.status == 'pending', Job.run_at <= now),
+               and_(Job.status == 'running', Job.updated_at < now - LEASE))
+
+
+class JobQueue:
+    """Worker thread pool running jobs from the jobs table."""
+
+    def __init__(self, session_factory=SessionLocal, workers=WORKERS, poll_interval=POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def start(self):
+        """Start the worker threads (once)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._threads = [threading.Thread(target=self._run, name=f'portkey-jobs-{n}', daemon=True)
+                             for n in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the workers after their current job."""
+        with self._lock:
+            self._stopping.set()
+            self._wakeup.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def wake(self):
+        """Tell idle workers new jobs were committed."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_pending()
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + PRUNE_INTERVAL
+                    self.prune()
+                    catalog.prune_changes(session_factory=self.session_factory)
+            except Exception:
+                logger.exception("Job worker loop failed")
+                ran = 0
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def claim(self):
+        """Atomically take one due job; returns (id, name, payload, attempts, max_attempts) or None."""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            candidates = db.query(Job.id).filter(_due(now)).order_by(Job.run_at).limit(10).all()
+            for (job_id,) in candidates:
+                claimed = db.execute(update(Job).where(Job.id == job_id, _due(now)).values(
+                    status='running', attempts=Job.attempts + 1, updated_at=now)).rowcount
+                db.commit()
+                if claimed:
+                    job = db.get(Job, job_id)
+                    return job.id, job.name, job.payload, job.attempts, job.max_attempts
+            return None
+        finally:
+            db.close()
+
+    def run_pending(self, limit=100):
+        """Run due jobs until none are left (or `limit`); returns how many ran."""
+        ran = 0
+        while ran < limit and not self._stopping.is_set():
+            claimed = self.claim()
+            if claimed is None:
+                break
+            self._execute(*claimed)
+            ran += 1
+        return ran
+
+    def _execute(self, job_id, name, payload, attempts, max_attempts):
+        handler = _handlers.get(name)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job '{name}'")
+            handler(**json.loads(payload))
+        except Exception as e:
+            retry = attempts < max_attempts
+            outcome = 'retry' if retry else 'failed'
+            values = {'status': 'pending' if retry else 'failed', 'last_error': f'{type(e).__name__}: {e}'[:1000],
+                      'run_at': datetime.utcnow() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))}
+            logger.warning("Job %s (%s) attempt %d/%d failed: %s", job_id, name, attempts, max_attempts, e,
+                           exc_info=not retry)
+        else:
+            outcome = 'done'
+            values = {'status': 'done', 'last_error': None}
+        job_latency.observe(time.perf_counter() - start, name)
+        jobs_total.inc(name, outcome)
+
+        db = self.session_factory()
+        try:
+            db.execute(update(Job).where(Job.id == job_id).values(updated_at=datetime.utcnow(), **values))
+            db.commit()
+        finally:
+            db.close()
+
+    def prune(self, older_than=RETENTION):
+        """Delete finished jobs older than `older_than`."""
+        db = self.session_factory()
+        try:
+            deleted = db.execute(delete(Job).where(Job.status == 'done',
+                                                   Job.updated_at < datetime.utcnow() - older_than)).rowcount
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+queue = JobQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        queue.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+# ============ TASKS ============
+
+@task('order_placed')
+def order_placed(order_id):
+    """Post-checkout work for a new order, starting with the customer's receipt."""
+    db = SessionLocal()
+    try:
+        order = db.get(Order, order_id)
+        if order is None:
+            return  # Removed before the job ran
+        lines = [f"{item.quantity} x {item.menu_item.name}: {format_inr(line_total_paise(item.unit_price, item.quantity))}"
+                 for item in order.order_items]
+        # No mail provider is configured yet; the receipt goes to the log
+        logger.info("Receipt for order #%s (%s):\n  %s\n  Total: %s",
+                    order.id, order.payment_id, '\n  '.join(lines), format_inr(int(order.total_amount * 100)))
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run background job workers.')
+    parser.add_argument('--workers', type=int, default=max(WORKERS, 1), help='Worker threads')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    queue.workers = args.workers
+    queue.start()
+    print(f"Running {args.workers} job workers, Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        queue.stop()
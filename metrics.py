@@ -0,0 +1,238 @@
+"""Lightweight instrumentation for Portkey app, exposed in Prometheus text format.
+
+Metrics are plain in-process counters and fixed-bucket histograms guarded by a
+lock, cheap enough to leave on in production. Each worker process exposes its
+own values; Prometheus sums them across workers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}'
+                for labels, value in items]
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, labels, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labels, labels, ("le", "+Inf"))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(float(series[-2]))}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics plus callbacks reporting cache statistics."""
+
+    def __init__(self):
+        self.metrics = []
+        self.cache_stats = {}  # cache name -> callable returning {'hits': .., 'misses': .., 'size': ..}
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name, stats):
+        """Report a cache's hit ratio; `stats` returns a dict with hits, misses and size."""
+        self.cache_stats[name] = stats
+
+    def _cache_lines(self):
+        if not self.cache_stats:
+            return []
+        series = {'hits': [], 'misses': [], 'size': [], 'ratio': []}
+        for name, stats in sorted(self.cache_stats.items()):
+            values = stats()
+            hits, misses = values.get('hits', 0), values.get('misses', 0)
+            labels = _format_labels(('cache',), (name,))
+            series['hits'].append(f'portkey_cache_hits_total{labels} {hits}')
+            series['misses'].append(f'portkey_cache_misses_total{labels} {misses}')
+            series['size'].append(f'portkey_cache_entries{labels} {values.get("size", 0)}')
+            series['ratio'].append(f'portkey_cache_hit_ratio{labels} {hits / (hits + misses) if hits + misses else 0.0}')
+        return [
+            '# HELP portkey_cache_hits_total Cache lookups that found an entry.',
+            '# TYPE portkey_cache_hits_total counter', *series['hits'],
+            '# HELP portkey_cache_misses_total Cache lookups that found nothing.',
+            '# TYPE portkey_cache_misses_total counter', *series['misses'],
+            '# HELP portkey_cache_entries Entries currently held by the cache.',
+            '# TYPE portkey_cache_entries gauge', *series['size'],
+            '# HELP portkey_cache_hit_ratio Share of lookups served from the cache.',
+            '# TYPE portkey_cache_hit_ratio gauge', *series['ratio'],
+        ]
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        lines.extend(self._cache_lines())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    'portkey_http_request_duration_seconds', 'Time spent handling HTTP requests.', ('endpoint', 'method', 'status'))
+request_queries = registry.histogram(
+    'portkey_http_request_db_queries', 'SQL statements executed per HTTP request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+request_query_time = registry.histogram(
+    'portkey_http_request_db_seconds', 'Time spent in SQL statements per HTTP request.', ('endpoint',))
+query_latency = registry.histogram(
+    'portkey_db_query_duration_seconds', 'Time spent executing individual SQL statements.', ('operation',))
+chatbot_latency = registry.histogram(
+    'portkey_chatbot_response_duration_seconds', 'Time spent building chatbot responses.', ('intent',))
+errors = registry.counter(
+    'portkey_errors_total', 'Errors caught and reported by the app.', ('source',))
+
+# Per-request SQL totals; None outside of a request
+_request_db_stats = ContextVar('request_db_stats', default=None)
+
+
+def instrument_engine(engine):
+    """Time every SQL statement executed through the engine."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        query_latency.observe(elapsed, statement.lstrip()[:6].upper())
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, 'handle_error')
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
+        errors.inc('database')
+
+
+def init_app(app):
+    """Record per-route latency and SQL usage, and serve them at /metrics."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+        _request_db_stats.set([0, 0.0])
+
+    def _finish(status):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe(time.perf_counter() - start, endpoint, request.method, status)
+        queries, query_time = _request_db_stats.get() or (0, 0.0)
+        request_queries.observe(queries, endpoint)
+        request_query_time.observe(query_time, endpoint)
+        _request_db_stats.set(None)
+
+    @app.after_request
+    def _record_request(response):
+        _finish(str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exception):
+        if exception is not None:
+            errors.inc('request')
+        _finish('500')
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint."""
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return 'Unauthorized\n', 401
+        return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
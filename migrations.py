@@ -0,0 +1,200 @@
+"""
+Schema migrations and SQLite snapshots for Portkey app.
+
+The schema version lives in the schema_version table. A fresh database is
+created straight from the models and stamped with the latest version; an
+existing database only runs the migrations it hasn't seen yet, so setup never
+drops data. Snapshots copy a ready (migrated and seeded) SQLite database with
+the backup API, letting test fixtures and new workers start from a clone
+instead of seeding again.
+
+Add a migration by appending a function to MIGRATIONS; its position is its
+version number. Never edit or reorder migrations that have shipped, and spell
+out their DDL rather than reading it from the models, which only describe the
+latest version.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, create_engine, func, inspect,
+                        select, text)
+from sqlalchemy.pool import StaticPool
+from models import Base, CatalogChange, Job
+
+# Kept out of Base.metadata so create_all() on the models never touches it
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Tables present before migrations were introduced
+BASELINE_TABLES = {'users', 'restaurants', 'menu_items', 'cart_items', 'orders', 'order_items',
+                   'feedback', 'delivery_feedback'}
+
+
+def baseline(conn):
+    """Tables created by the original init_db()."""
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in sorted(BASELINE_TABLES)])
+
+
+def add_catalog_changes(conn):
+    """Change log behind catalog versions and delta sync."""
+    CatalogChange.__table__.create(conn, checkfirst=True)
+
+
+def add_composite_indexes(conn):
+    """Composite indexes for the hot paths, replacing unused single-column ones."""
+    for name in ('ix_restaurants_name', 'ix_restaurants_cuisine_type', 'ix_menu_items_name',
+                 'ix_menu_items_category', 'ix_cart_items_session_id', 'ix_cart_items_user_id',
+                 'ix_cart_items_menu_item_id', 'ix_orders_user_id'):
+        conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    # The indexes as they shipped with this migration; later migrations reshape them
+    for ddl in ('CREATE INDEX IF NOT EXISTS ix_cart_items_user_id_menu_item_id '
+                'ON cart_items (user_id, menu_item_id) WHERE user_id IS NOT NULL',
+                'CREATE INDEX IF NOT EXISTS ix_cart_items_session_id_menu_item_id '
+                'ON cart_items (session_id, menu_item_id) WHERE session_id IS NOT NULL',
+                'CREATE INDEX IF NOT EXISTS ix_orders_user_id_created_at ON orders (user_id, created_at DESC)',
+                'CREATE INDEX IF NOT EXISTS ix_menu_items_availability_stock_quantity '
+                'ON menu_items (availability, stock_quantity)'):
+        conn.execute(text(ddl))
+
+
+def add_jobs(conn):
+    """Persistent background job records."""
+    Job.__table__.create(conn, checkfirst=True)
+
+
+def cover_order_status(conn):
+    """Carry status in the order history index so status lookups skip the table."""
+    conn.execute(text('DROP INDEX IF EXISTS ix_orders_user_id_created_at'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_orders_user_id_created_at_status '
+                      'ON orders (user_id, created_at DESC, status)'))
+
+
+def unique_cart_lines(conn):
+    """Merge duplicate cart lines, then make (owner, menu item) unique."""
+    for owner in ('user_id', 'session_id'):
+        duplicates = conn.execute(text(
+            f'SELECT MIN(id), SUM(quantity) FROM cart_items WHERE {owner} IS NOT NULL '
+            f'GROUP BY {owner}, menu_item_id HAVING COUNT(*) > 1')).all()
+        for keep, quantity in duplicates:
+            # The oldest line takes the whole quantity, capped like any other line
+            conn.execute(text(f'DELETE FROM cart_items WHERE id != :keep AND ({owner}, menu_item_id) = '
+                              f'(SELECT {owner}, menu_item_id FROM cart_items WHERE id = :keep)'), {'keep': keep})
+            conn.execute(text('UPDATE cart_items SET quantity = :quantity WHERE id = :keep'),
+                         {'keep': keep, 'quantity': min(quantity, 20)})
+        conn.execute(text(f'DROP INDEX IF EXISTS ix_cart_items_{owner}_menu_item_id'))
+        conn.execute(text(f'CREATE UNIQUE INDEX ix_cart_items_{owner}_menu_item_id '
+                          f'ON cart_items ({owner}, menu_item_id) WHERE {owner} IS NOT NULL'))
+
+
+def index_cart_menu_items(conn):
+    """Bring back the cart_items(menu_item_id) index migration 3 dropped; no composite leads with it."""
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_cart_items_menu_item_id ON cart_items (menu_item_id)'))
+
+
+MIGRATIONS = [
+    baseline,
+    add_catalog_changes,
+    add_composite_indexes,
+    add_jobs,
+    cover_order_status,
+    unique_cart_lines,
+    index_cart_menu_items,
+]
+LATEST = len(MIGRATIONS)
+
+
+def current_version(conn):
+    """Schema version of the database, or None before migrations were introduced."""
+    if not inspect(conn).has_table('schema_version'):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar()
+
+
+def _record(conn, version, name):
+    conn.execute(schema_version.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+
+
+def migrate(engine, verbose=False):
+    """Bring the database up to the latest schema version; returns the versions applied."""
+    with engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            # Take the write lock up front so concurrent workers migrate one at a time
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        schema_version.create(conn, checkfirst=True)
+        version = current_version(conn)
+        applied = []
+
+        if version is None:
+            existing = set(inspect(conn).get_table_names())
+            if not existing & BASELINE_TABLES:
+                # Fresh database: build the current schema directly
+                Base.metadata.create_all(conn)
+                for number, migration in enumerate(MIGRATIONS, start=1):
+                    _record(conn, number, migration.__name__)
+                conn.commit()
+                if verbose:
+                    print(f"Created schema at version {LATEST}")
+                return list(range(1, LATEST + 1))
+            # Database from before migrations existed
+            baseline(conn)
+            _record(conn, 1, baseline.__name__)
+            version = 1
+
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            _record(conn, number, migration.__name__)
+            applied.append(number)
+            if verbose:
+                print(f"Applied migration {number}: {migration.__name__}")
+        conn.commit()
+    return applied
+
+
+def _sqlite_path(engine_or_path):
+    if isinstance(engine_or_path, str):
+        return engine_or_path
+    if engine_or_path.dialect.name != 'sqlite' or not engine_or_path.url.database:
+        raise ValueError('Snapshots need a file-backed SQLite database')
+    return engine_or_path.url.database
+
+
+def snapshot(source, destination):
+    """Copy a SQLite database (engine or path) to a snapshot file with the backup API."""
+    tmp = f'{destination}.tmp'
+    src = sqlite3.connect(_sqlite_path(source))
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp, destination)  # Readers never see a half-written snapshot
+    return destination
+
+
+def restore(snapshot_path, destination):
+    """Clone a snapshot into a database file (engine or path), replacing its contents."""
+    src = sqlite3.connect(snapshot_path)
+    dst = sqlite3.connect(_sqlite_path(destination))
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return destination
+
+
+def memory_engine(snapshot_path):
+    """In-memory engine holding a copy of a snapshot, for tests."""
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    src = sqlite3.connect(snapshot_path)
+    try:
+        src.backup(conn)
+    finally:
+        src.close()
+    return create_engine('sqlite://', creator=lambda: conn, poolclass=StaticPool)
@@ -1,6 +1,6 @@
 """SQLAlchemy models for Portkey food ordering app."""
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DECIMAL, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, ForeignKey, DECIMAL, DateTime, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -44,11 +44,11 @@ class Restaurant(Base):
     __tablename__ = 'restaurants'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(100), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
     address = Column(String(200), nullable=False)
     contact = Column(String(50), nullable=False)
     operating_hours = Column(String(100), nullable=False)  # e.g., "Mon-Sun: 10AM-10PM"
-    cuisine_type = Column(String(50), nullable=False, index=True)  # e.g., "Italian", "Chinese"
+    cuisine_type = Column(String(50), nullable=False)  # e.g., "Italian", "Chinese"
 
     # Relationship to menu items
     menu_items = relationship("MenuItem", back_populates="restaurant", cascade="all, delete-orphan")
@@ -76,10 +76,10 @@ class MenuItem(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     restaurant_id = Column(Integer, ForeignKey('restaurants.id'), nullable=False, index=True)
-    name = Column(String(100), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
     description = Column(String(500), nullable=False)
     price = Column(DECIMAL(10, 2), nullable=False)
-    category = Column(String(50), nullable=False, index=True)  # e.g., "Appetizer", "Main", "Dessert", "Beverage"
+    category = Column(String(50), nullable=False)  # e.g., "Appetizer", "Main", "Dessert", "Beverage"
     availability = Column(Boolean, default=True, nullable=False)
     stock_quantity = Column(Integer, default=100, nullable=False)  # Available stock
 
@@ -119,8 +119,9 @@ class CartItem(Base):
     __tablename__ = 'cart_items'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    session_id = Column(String(100), nullable=True, index=True)  # Anonymous session tracking
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)  # User ID for logged-in users
+    session_id = Column(String(100), nullable=True)  # Anonymous session tracking
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # User ID for logged-in users
+    # Own index: the composites lead with the owner, and menu item deletes look lines up by item
     menu_item_id = Column(Integer, ForeignKey('menu_items.id'), nullable=False, index=True)
     quantity = Column(Integer, nullable=False, default=1)
     unit_price = Column(DECIMAL(10, 2), nullable=False)
@@ -159,7 +160,7 @@ class Order(Base):
     __tablename__ = 'orders'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     total_amount = Column(DECIMAL(10, 2), nullable=False)  # Total in INR
     status = Column(String(50), nullable=False, default='confirmed')  # confirmed, preparing, ready, out_for_delivery, delivered, cancelled
     delivery_address = Column(String(500), nullable=True)
@@ -285,3 +286,82 @@ class DeliveryFeedback(Base):
             'comment': self.comment,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class CatalogChange(Base):
+    """Catalog change log entry; its id is the monotonic catalog version."""
+
+    __tablename__ = 'catalog_changes'
+    __table_args__ = {'sqlite_autoincrement': True}  # Never reuse ids, even after pruning
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)  # restaurant, menu_item
+    entity_id = Column(Integer, nullable=False)
+    restaurant_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String(10), nullable=False)  # upsert, delete
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<CatalogChange(id={self.id}, {self.operation} {self.entity}={self.entity_id})>"
+
+    def to_dict(self):
+        """Convert catalog change object to dictionary for API responses."""
+        return {
+            'version': self.id,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'restaurant_id': self.restaurant_id,
+            'operation': self.operation,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
+class Job(Base):
+    """Background job record; jobs are committed with the work that triggers them."""
+
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False, default='{}')  # JSON arguments
+    status = Column(String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Not before; retries back off
+    last_error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, name='{self.name}', status='{self.status}', attempts={self.attempts})>"
+
+    def to_dict(self):
+        """Convert job object to dictionary for API responses."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+# Composite indexes for the hot access paths; check them with index_advisor.py.
+# Cart lines are looked up by owner (user or anonymous session) and menu item;
+# one line per owner and item, so adds can UPSERT into it (see shopping_cart.py)
+Index('ix_cart_items_user_id_menu_item_id', CartItem.user_id, CartItem.menu_item_id, unique=True,
+      sqlite_where=CartItem.user_id.isnot(None), postgresql_where=CartItem.user_id.isnot(None))
+Index('ix_cart_items_session_id_menu_item_id', CartItem.session_id, CartItem.menu_item_id, unique=True,
+      sqlite_where=CartItem.session_id.isnot(None), postgresql_where=CartItem.session_id.isnot(None))
+# Order history lists a user's orders newest first; carrying status makes the
+# chatbot's "where is my order?" lookup an index-only read
+Index('ix_orders_user_id_created_at_status', Order.user_id, Order.created_at.desc(), Order.status)
+# The chatbot menu sample only wants items that can be ordered
+Index('ix_menu_items_availability_stock_quantity', MenuItem.availability, MenuItem.stock_quantity)
+# Workers poll for due pending jobs
+Index('ix_jobs_status_run_at', Job.status, Job.run_at)
@@ -0,0 +1,192 @@
+"""
+Order lifecycle for Portkey app.
+
+Orders move confirmed → preparing → ready → out_for_delivery → delivered, and
+can be cancelled until the kitchen has finished them. Transitions are checked
+against TRANSITIONS and applied with a conditional UPDATE, so two concurrent
+changes to the same order can't both win. Committed changes are published on
+an in-process broker that the order event stream (SSE) subscribes to; a
+StatusPoller feeds it the changes other processes commit, with one query per
+interval for all of the process's open streams.
+"""
+
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from models import Order
+import metrics
+
+logger = logging.getLogger('portkey.order_status')
+
+TRANSITIONS = {
+    'confirmed': {'preparing', 'cancelled'},
+    'preparing': {'ready', 'cancelled'},
+    'ready': {'out_for_delivery'},
+    'out_for_delivery': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+FINAL_STATUSES = {status for status, targets in TRANSITIONS.items() if not targets}
+
+transitions_total = metrics.registry.counter(
+    'portkey_order_transitions_total', 'Order status changes, by new status.', ('status',))
+
+
+class InvalidTransition(ValueError):
+    """Raised when an order can't move to the requested status."""
+
+
+class Broker:
+    """In-process publish/subscribe of events by topic."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}  # topic -> set of queues
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic):
+        """Start receiving events for a topic; pair with unsubscribe()."""
+        subscription = queue.Queue(self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, event):
+        """Deliver an event to the topic's current subscribers; never blocks."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                pass  # A stalled client re-reads the order when it reconnects
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def topics(self):
+        """Topics that currently have subscribers."""
+        with self._lock:
+            return list(self._subscribers)
+
+
+class StatusPoller:
+    """Publishes status changes committed by other processes for this process's subscribed orders.
+
+    Runs on one background thread, started by the first subscriber. Each poll
+    re-reads orders updated since shortly before the previous one, so a
+    change that committed late is still seen; subscribers skip repeats.
+    """
+
+    OVERLAP = timedelta(seconds=5)
+    BATCH_SIZE = 500  # Order ids per query
+
+    def __init__(self, broker, session_factory, interval=1.0):
+        self.broker = broker
+        self.session_factory = session_factory
+        self.interval = interval
+        self._since = datetime.utcnow()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start polling unless this process already is (a forked child starts its own)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='order-status-poller', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Order status poll failed")
+
+    def poll(self):
+        """Publish recent changes to subscribed orders; returns how many orders were published."""
+        started = datetime.utcnow()
+        order_ids = self.broker.topics()
+        if not order_ids:
+            self._since = started
+            return 0
+        rows = []
+        db = self.session_factory()
+        try:
+            for start in range(0, len(order_ids), self.BATCH_SIZE):
+                rows += db.query(Order.id, Order.status, Order.updated_at).filter(
+                    Order.id.in_(order_ids[start:start + self.BATCH_SIZE]),
+                    Order.updated_at >= self._since - self.OVERLAP).all()
+        finally:
+            db.close()
+        self._since = started
+        for order in rows:
+            self.broker.publish(order.id, status_event(order))
+        return len(rows)
+
+
+broker = Broker()
+_event_ids = itertools.count(1)
+
+
+def can_transition(current, new):
+    return new in TRANSITIONS.get(current, ())
+
+
+def transition(db, order, new_status):
+    """Move an order to `new_status` in the caller's transaction; published once it commits."""
+    previous = order.status
+    if new_status not in TRANSITIONS:
+        raise InvalidTransition(f"Unknown order status '{new_status}'")
+    if not can_transition(previous, new_status):
+        raise InvalidTransition(f"Order #{order.id} can't go from {previous} to {new_status}")
+
+    now = datetime.utcnow()
+    changed = db.execute(update(Order).where(Order.id == order.id, Order.status == previous)
+                         .values(status=new_status, updated_at=now)).rowcount
+    if not changed:
+        raise InvalidTransition(f"Order #{order.id} changed concurrently; reload and retry")
+    db.expire(order, ['status', 'updated_at'])
+    db.info.setdefault('order_events', []).append(
+        {'order_id': order.id, 'status': new_status, 'previous': previous, 'updated_at': now.isoformat()})
+    return order
+
+
+def status_event(order):
+    """Snapshot event for an order's current status."""
+    return {'order_id': order.id, 'status': order.status, 'previous': None,
+            'updated_at': order.updated_at.isoformat() if order.updated_at else None}
+
+
+def format_sse(event):
+    """Encode an event for a text/event-stream response."""
+    return f"id: {next(_event_ids)}\nevent: status\ndata: {json.dumps(event)}\n\n"
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    for order_event in session.info.pop('order_events', ()):
+        transitions_total.inc(order_event['status'])
+        broker.publish(order_event['order_id'], order_event)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_events(session):
+    session.info.pop('order_events', None)
@@ -0,0 +1,77 @@
+"""Pricing helpers for Portkey app - precomputed INR prices stored as integer paise."""
+
+import os
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from models import MenuItem
+
+# Currency conversion rate (USD to INR)
+USD_TO_INR = Decimal(os.getenv('USD_TO_INR', '83.0'))
+
+# Price table: USD price -> INR price in paise. Menus use a small set of
+# distinct prices, so this stays tiny and is rebuilt in bulk on rate change.
+_price_table = {}
+_lock = threading.Lock()
+
+
+def _to_decimal(amount):
+    """Convert a price from the database or a form to Decimal without float rounding."""
+    return amount if isinstance(amount, Decimal) else Decimal(str(amount))
+
+
+def _compute_paise(usd_amount, rate):
+    """Convert a USD amount to INR paise, rounding half up to the nearest paisa."""
+    return int((usd_amount * rate * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def inr_paise(usd_amount):
+    """Get the INR price in paise for a USD amount."""
+    usd_amount = _to_decimal(usd_amount)
+    paise = _price_table.get(usd_amount)
+    if paise is None:
+        paise = _compute_paise(usd_amount, USD_TO_INR)
+        with _lock:
+            _price_table[usd_amount] = paise
+    return paise
+
+
+def line_total_paise(unit_price_usd, quantity):
+    """Get the INR total in paise for a line of `quantity` units."""
+    return inr_paise(unit_price_usd) * quantity
+
+
+def paise_to_inr(paise):
+    """Convert integer paise to a rupee Decimal with two decimal places."""
+    return Decimal(paise).scaleb(-2)
+
+
+def format_inr(paise):
+    """Format integer paise for display, e.g. 99600 -> '₹996.00'."""
+    return f"₹{paise_to_inr(paise):,.2f}"
+
+
+def load_price_table(db):
+    """Precompute INR prices for every distinct menu price in one query."""
+    prices = [row[0] for row in db.query(MenuItem.price).distinct()]
+    rebuild_price_table(prices)
+
+
+def _rebuild(prices):
+    """Replace the price table with freshly computed prices. Caller holds the lock."""
+    table = {price: _compute_paise(price, USD_TO_INR) for price in prices}
+    _price_table.clear()
+    _price_table.update(table)
+
+
+def rebuild_price_table(prices=None):
+    """Recompute the price table in bulk for the current exchange rate."""
+    with _lock:
+        _rebuild(list(_price_table) if prices is None else [_to_decimal(p) for p in prices])
+
+
+def set_exchange_rate(rate):
+    """Update the USD to INR rate and recompute all precomputed prices."""
+    global USD_TO_INR
+    with _lock:
+        USD_TO_INR = _to_decimal(rate)
+        _rebuild(list(_price_table))
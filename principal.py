@@ -0,0 +1,55 @@
+"""
+Current-user principal for Portkey app.
+
+Pages only need a few facts about the logged-in user, so instead of loading
+the ORM User on every request they get a Principal: a small slotted record
+cached per user for PRINCIPAL_TTL seconds, in every worker's cache tiers.
+Changes to an account must call forget_user() after committing.
+"""
+
+import os
+from db import SessionLocal
+from models import User
+import cache
+
+PRINCIPAL_TTL = float(os.getenv('PORTKEY_PRINCIPAL_TTL', '60'))
+
+
+class Principal:
+    """The logged-in user as pages see it; no password hash and no database session."""
+
+    __slots__ = ('id', 'username', 'email', 'created_at')
+
+    def __init__(self, id, username, email, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f"<Principal(id={self.id}, username='{self.username}')>"
+
+
+principal_cache = cache.Cache('principals', max_size=10000, ttl=PRINCIPAL_TTL, shared=True)
+
+
+def user_tag(user_id):
+    """Cache tag for everything derived from a user's account."""
+    return f'user:{user_id}'
+
+
+def load_principal(user_id):
+    """Get the Principal for a user id, or None if the account no longer exists."""
+    def load():
+        db = SessionLocal()
+        try:
+            row = db.query(User.id, User.username, User.email, User.created_at).filter(User.id == user_id).first()
+            return Principal(*row) if row else None
+        finally:
+            db.close()
+    return principal_cache.get_or_set(user_id, load, tags=(user_tag(user_id),))
+
+
+def forget_user(user_id):
+    """Retire the cached principal after the account changes or is deleted."""
+    cache.invalidate(user_tag(user_id))
@@ -0,0 +1,155 @@
+"""Opt-in per-request profiler for Portkey app.
+
+A request is profiled with cProfile when it carries a valid signed
+X-Portkey-Profile header, or when its endpoint is listed in the
+PROFILE_ENDPOINTS config (set by an admin while investigating a page).
+Profiles are written as pstats files into a bounded ring buffer directory
+and can be downloaded from /debug/profiles with the same signed header.
+
+Mint a header value with:  python profiler.py --ttl 3600
+"""
+
+import argparse
+import cProfile
+import hashlib
+import hmac
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from flask import g, request, abort, jsonify, send_from_directory
+
+PROFILE_HEADER = 'X-Portkey-Profile'
+DEFAULT_KEEP = 20
+
+# Only one cProfile session can be active per process on newer Pythons
+_active = threading.Lock()
+
+
+def make_token(secret_key, ttl=3600):
+    """Create a signed, expiring profiling token."""
+    expires = int(time.time()) + ttl
+    signature = hmac.new(_key(secret_key), f'profile:{expires}'.encode(), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+
+def verify_token(secret_key, token):
+    """Check a profiling token's signature and expiry."""
+    expires, _, signature = (token or '').partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(_key(secret_key), f'profile:{expires}'.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def _key(secret_key):
+    return secret_key if isinstance(secret_key, bytes) else str(secret_key).encode()
+
+
+class ProfileStore:
+    """Directory keeping only the most recent `keep` profiles."""
+
+    NAME_PATTERN = re.compile(r'^[\w.-]+\.prof$')
+
+    def __init__(self, directory, keep=DEFAULT_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profile, endpoint):
+        """Write a profile and evict the oldest ones beyond the limit."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint or 'unmatched'}-{uuid.uuid4().hex[:8]}.prof"
+        profile.dump_stats(os.path.join(self.directory, name))
+        with self._lock:
+            for old in self.list()[self.keep:]:
+                try:
+                    os.remove(os.path.join(self.directory, old['name']))
+                except FileNotFoundError:
+                    pass
+        return name
+
+    def list(self):
+        """List stored profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if self.NAME_PATTERN.match(name):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append({'name': name, 'size': stat.st_size, 'created_at': stat.st_mtime})
+        return sorted(entries, key=lambda entry: (entry['created_at'], entry['name']), reverse=True)
+
+    def is_valid_name(self, name):
+        return bool(self.NAME_PATTERN.match(name))
+
+
+def init_app(app):
+    """Install the opt-in profiling hooks and download endpoints."""
+    store = ProfileStore(
+        app.config.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'portkey-profiles'),
+        app.config.get('PROFILE_KEEP', DEFAULT_KEEP))
+    app.extensions['profile_store'] = store
+
+    def is_authorized():
+        return verify_token(app.config['SECRET_KEY'], request.headers.get(PROFILE_HEADER))
+
+    @app.before_request
+    def _start_profile():
+        wanted = request.endpoint in app.config.get('PROFILE_ENDPOINTS', ())
+        if not wanted and PROFILE_HEADER not in request.headers:
+            return
+        if not wanted and not is_authorized():
+            return
+        if not _active.acquire(blocking=False):
+            return  # Another request is being profiled
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+    @app.after_request
+    def _add_profile_header(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            _active.release()
+            response.headers['X-Portkey-Profile-Id'] = store.save(profile, request.endpoint)
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exception):
+        # Requests that failed before after_request still release the profiler
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            _active.release()
+
+    @app.route('/debug/profiles')
+    def list_profiles():
+        """List stored request profiles."""
+        if not is_authorized():
+            abort(404)
+        return jsonify(store.list())
+
+    @app.route('/debug/profiles/<name>')
+    def download_profile(name):
+        """Download a stored profile (load it with pstats or snakeviz)."""
+        if not is_authorized() or not store.is_valid_name(name):
+            abort(404)
+        return send_from_directory(store.directory, name, as_attachment=True,
+                                   mimetype='application/octet-stream')
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mint a signed X-Portkey-Profile header value.')
+    parser.add_argument('--ttl', type=int, default=3600, help='Seconds the token stays valid')
+    args = parser.parse_args()
+    load_dotenv()
+    secret_key = os.getenv('SECRET_KEY')
+    if not secret_key:
+        parser.error('SECRET_KEY must be set to the app\'s secret key')
+    print(f'{PROFILE_HEADER}: {make_token(secret_key, args.ttl)}')
@@ -0,0 +1,221 @@
+"""Rate limiting and load shedding for Portkey app's hot endpoints.
+
+Each limited endpoint has a token bucket per client (logged-in user, anonymous
+cart session, or IP address). Buckets live in process memory by default; set
+PORTKEY_RATE_LIMIT_DB to a SQLite file to share them between workers. Separately,
+a load shedder caps the requests in flight on limited endpoints, so a burst is
+turned away with 503 before it queues up behind the database writer.
+
+Behind a reverse proxy (nginx, the Heroku router) every request arrives from
+the proxy's address, so set PORTKEY_PROXY_COUNT to the number of proxies in
+front of the app; client addresses are then read from X-Forwarded-For. Leave
+it at 0 when clients connect directly, or they could forge their address.
+If the shared bucket store fails, requests are allowed rather than refused.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from flask import request, session, jsonify, make_response
+from werkzeug.middleware.proxy_fix import ProxyFix
+import metrics
+
+logger = logging.getLogger('portkey.ratelimit')
+
+# endpoint -> (tokens per second, burst capacity, key); only writes are limited
+DEFAULT_LIMITS = {
+    'add_to_cart': (2.0, 10, 'client'),
+    'add_cart_item_api': (2.0, 10, 'client'),
+    'set_cart_item_api': (2.0, 10, 'client'),
+    'remove_cart_item_api': (2.0, 10, 'client'),
+    'chatbot_endpoint': (1.0, 10, 'client'),
+    'login': (0.2, 5, 'ip'),  # Slows password guessing per address
+    'process_payment': (0.2, 3, 'client'),
+}
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+MAX_IN_FLIGHT = int(os.getenv('PORTKEY_MAX_IN_FLIGHT', '32'))
+PROXY_COUNT = int(os.getenv('PORTKEY_PROXY_COUNT', '0'))
+SHED_RETRY_AFTER = 1
+
+rejected = metrics.registry.counter(
+    'portkey_rate_limited_total', 'Requests turned away early, by endpoint and reason.', ('endpoint', 'reason'))
+
+
+def refill(tokens, updated, now, rate, capacity):
+    """Tokens in a bucket at `now`, given its last known level."""
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryStore:
+    """Token buckets for one process, bounded to `max_keys` clients."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, cost=1):
+        """Take `cost` tokens; returns seconds to wait, or 0 if allowed."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, rate, capacity)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Least recently seen clients are the ones most likely back to a full bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+_sqlite_stores = weakref.WeakSet()
+
+
+class SQLiteStore:
+    """Token buckets shared by every worker through a small SQLite file.
+
+    Opened on first use, with a connection per thread; a forked worker drops
+    the connections it inherits.
+    """
+
+    def __init__(self, path, cleanup_after=3600):
+        self.path = path
+        self.cleanup_after = cleanup_after
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        self._ready = False
+        _sqlite_stores.add(self)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            if not self._ready:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                             'updated REAL NOT NULL)')
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def _after_fork(self):
+        self._local = threading.local()
+
+    def take(self, key, rate, capacity, cost=1):
+        now = time.time()  # Wall clock: buckets are shared between processes
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = refill(*row, now, rate, capacity) if row else capacity
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            conn.execute('INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                         (key, tokens, now))
+            if now >= self._next_cleanup:
+                self._next_cleanup = now + self.cleanup_after
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - self.cleanup_after,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+def _reset_after_fork():
+    for store in list(_sqlite_stores):
+        store._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):  # Not on Windows, which doesn't fork
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LoadShedder:
+    """Caps concurrent requests; extra ones are refused instead of queued."""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def try_enter(self):
+        return self._slots.acquire(blocking=False)
+
+    def leave(self):
+        self._slots.release()
+
+    def in_flight(self):
+        return self.max_in_flight - self._slots._value
+
+
+def client_key(kind):
+    """Identify the client: logged-in user, then cart session, then address."""
+    if kind == 'client':
+        if session.get('user_id'):
+            return f"user:{session['user_id']}"
+        if session.get('session_id'):
+            return f"session:{session['session_id']}"
+    return f'ip:{request.remote_addr}'
+
+
+def _reject(status, message, retry_after):
+    if request.path.startswith('/api/') or request.is_json:
+        body = jsonify({'error': message, 'retry_after': retry_after})
+    else:
+        body = message + '\n'
+    response = make_response(body, status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_app(app, store=None):
+    """Limit and shed load on the configured endpoints."""
+    limits = dict(DEFAULT_LIMITS, **app.config.get('RATE_LIMITS', {}))
+    if store is None:
+        path = app.config.get('RATE_LIMIT_DB') or os.getenv('PORTKEY_RATE_LIMIT_DB')
+        store = SQLiteStore(path) if path else MemoryStore()
+    shedder = LoadShedder(app.config.get('MAX_IN_FLIGHT', MAX_IN_FLIGHT))
+    proxies = app.config.get('PROXY_COUNT', PROXY_COUNT)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    app.extensions['rate_limit_store'] = store
+    app.extensions['load_shedder'] = shedder
+
+    @app.before_request
+    def _limit():
+        limit = limits.get(request.endpoint)
+        if limit is None or request.method not in WRITE_METHODS or not app.config.get('RATE_LIMIT_ENABLED', True):
+            return None
+        if not shedder.try_enter():
+            rejected.inc(request.endpoint, 'overloaded')
+            return _reject(503, 'Server is busy, please retry shortly.', SHED_RETRY_AFTER)
+        request.environ['portkey.shed_slot'] = True
+
+        rate, capacity, kind = limit
+        try:
+            wait = store.take(f'{request.endpoint}:{client_key(kind)}', rate, capacity)
+        except sqlite3.Error:
+            # Fail open: a broken limiter must not take the endpoint down with it
+            logger.warning("Rate limit store failed; allowing %s", request.endpoint, exc_info=True)
+            wait = 0
+        if wait:
+            rejected.inc(request.endpoint, 'rate_limited')
+            return _reject(429, 'Too many requests, please slow down.', math.ceil(wait))
+        return None
+
+    @app.teardown_request
+    def _release(exception):
+        if request.environ.pop('portkey.shed_slot', False):
+            shedder.leave()
+
+    return app
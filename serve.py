@@ -0,0 +1,189 @@
+"""
+Production server for Portkey app.
+
+Runs the app under gunicorn with several worker processes, each with a few
+threads. Pending migrations run once, in the master, before any worker
+starts; by default the app module is preloaded there too. Every worker then
+warms its caches and starts its job workers before it accepts a request. SIGHUP reloads the workers one at a
+time, and SIGTERM lets in-flight requests finish.
+
+    python serve.py --workers 4 --threads 8
+
+Order event streams (SSE) stay open for minutes. Under gthread each one holds
+a request thread, so a second server runs them on gevent, where an idle
+stream is just a greenlet and a worker holds thousands. The reverse proxy
+sends /api/orders/<id>/events there, and everything else to the main server:
+
+    python serve.py --events --bind 0.0.0.0:5001 --workers 2 --connections 2000
+
+gunicorn is optional (pip install gunicorn), and --events needs gevent
+(pip install gevent). Without gunicorn, for example on Windows, the app is
+served by a multi-threaded single-process server instead.
+"""
+
+import argparse
+import logging
+import os
+from dotenv import load_dotenv
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn is optional and doesn't run on Windows
+    BaseApplication = None
+
+try:
+    import gevent
+except ImportError:  # Only the --events server needs it
+    gevent = None
+
+logger = logging.getLogger('portkey.serve')
+
+
+def default_workers():
+    """gunicorn's rule of thumb: two workers per core, plus one."""
+    return int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Portkey app in production.')
+    parser.add_argument('--bind', default=f"0.0.0.0:{os.getenv('PORT', '5000')}", help='Address to listen on')
+    parser.add_argument('--workers', type=int, default=default_workers(), help='Worker processes')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('PORTKEY_THREADS', '4')),
+                        help='Threads per worker')
+    parser.add_argument('--keepalive', type=int, default=5, help='Seconds to hold idle keep-alive connections')
+    parser.add_argument('--timeout', type=int, default=60,
+                        help='Seconds a silent worker may take before it is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds in-flight requests get to finish on restart or shutdown')
+    parser.add_argument('--max-requests', type=int, default=5000,
+                        help='Recycle a worker after this many requests (0 to never)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help='Import the app in every worker instead of once in the master')
+    parser.add_argument('--no-warm-up', dest='warm_up', action='store_false',
+                        help='Skip filling caches before a worker takes traffic')
+    parser.add_argument('--events', action='store_true',
+                        help='Serve order event streams on gevent workers instead of the whole app')
+    parser.add_argument('--connections', type=int, default=1000,
+                        help='Open streams per worker with --events')
+    return parser.parse_args(argv)
+
+
+def _warm_worker(worker):
+    """Runs in each worker after it loads the app, before it accepts connections."""
+    import app
+    app.warm_up()
+
+
+def _start_worker(worker):
+    """Like _warm_worker, without filling caches."""
+    import app
+    app.start_services()
+
+
+def _stop_worker(server, worker):
+    """Let the worker's background jobs finish their current run."""
+    import jobs
+    jobs.queue.stop()
+
+
+def gunicorn_options(args):
+    """gunicorn settings for the parsed command line."""
+    if args.events:
+        return {
+            'bind': args.bind,
+            'workers': args.workers,
+            'worker_class': 'gevent',
+            'worker_connections': args.connections,
+            'keepalive': args.keepalive,
+            'timeout': args.timeout,
+            'graceful_timeout': args.graceful_timeout,
+            # Not preloaded: the app must be imported after gevent patches the worker
+            'preload_app': False,
+            'post_worker_init': _start_worker,
+            'accesslog': '-',
+        }
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        # gthread: a slow client holds a thread, not a whole worker. Order event
+        # streams belong on the --events server; here the app caps them per worker
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,  # Workers don't all restart at once
+        'preload_app': args.preload,
+        'post_worker_init': _warm_worker if args.warm_up else _start_worker,
+        'worker_exit': _stop_worker,
+        'accesslog': '-',
+    }
+
+
+def migrate_in_master():
+    """Apply pending migrations before forking, so workers never race to run them."""
+    from db import engine, ensure_schema
+    ensure_schema()
+    engine.dispose()  # Forked workers must open their own connections
+
+
+def load_app(preload):
+    """Import the app; when preloading, mark it migrated so workers only start their jobs."""
+    import app
+    if preload:
+        from db import engine
+        app.migrate_once()
+        engine.dispose()
+    return app.app
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """gunicorn application configured from a dict of settings."""
+
+        def __init__(self, options, migrate=True):
+            self.options = options
+            if migrate and not options['preload_app']:
+                migrate_in_master()  # Preloading migrates in load_app() instead
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app(self.options['preload_app'])
+
+
+def serve_threaded(args):
+    """Fallback without gunicorn: one process, one thread per request."""
+    from werkzeug.serving import run_simple
+    import app
+    host, _, port = args.bind.rpartition(':')
+    if args.warm_up:
+        app.warm_up()
+    else:
+        app.start_services()
+    logger.warning("gunicorn is not installed; serving from a single process on %s", args.bind)
+    run_simple(host or '0.0.0.0', int(port), app.app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if args.events:
+        if gevent is None or BaseApplication is None:
+            raise SystemExit('--events needs gunicorn and gevent: pip install gunicorn gevent')
+        # Workers import the app after this, so the settings apply to them
+        os.environ.setdefault('PORTKEY_MAX_EVENT_STREAMS', str(args.connections))
+        os.environ['PORTKEY_JOB_WORKERS'] = '0'  # The main server runs the jobs
+        Server(gunicorn_options(args), migrate=False).run()
+    else:
+        # Leave at least half of each worker's threads for ordinary requests
+        os.environ.setdefault('PORTKEY_MAX_EVENT_STREAMS', str(max(1, args.threads // 2)))
+        if BaseApplication is None:
+            serve_threaded(args)
+        else:
+            Server(gunicorn_options(args)).run()
@@ -1,11 +1,57 @@
-"""Setup script to initialize and seed the database."""
+"""Setup script to initialize and seed the database.
 
-from db import init_db, seed_db
+Setup is incremental: it applies pending migrations and seeds an empty
+database, keeping existing data unless --reset is given.
+
+    python setup.py                      # real Manipal & Mangalore restaurants
+    python setup.py --reset --synthetic --restaurants 2000 --users 100000 --orders 1000000 --seed 7
+    python setup.py --snapshot seeded.db # save the ready database for fast clones
+    python setup.py --from-snapshot seeded.db
+"""
+
+import argparse
+import migrations
+from db import engine, ensure_schema, init_db, seed_db
 
 if __name__ == "__main__":
-    print("Initializing database...")
-    init_db()
-    print("\nSeeding database with sample data...")
-    seed_db()
-    print("\nSetup complete! Run 'flask --app app.py run' to start the server.")
+    parser = argparse.ArgumentParser(description="Initialize and seed the database.")
+    parser.add_argument("--reset", action="store_true", help="Drop all tables first (deletes all data)")
+    parser.add_argument("--from-snapshot", metavar="PATH", help="Clone a snapshot instead of seeding")
+    parser.add_argument("--snapshot", metavar="PATH", help="Save the seeded database to a snapshot file")
+    parser.add_argument("--synthetic", action="store_true", help="Generate a large synthetic dataset instead")
+    parser.add_argument("--restaurants", type=int, default=100, help="Synthetic restaurants")
+    parser.add_argument("--items", type=int, default=20, help="Synthetic menu items per restaurant")
+    parser.add_argument("--users", type=int, default=1000, help="Synthetic users")
+    parser.add_argument("--orders", type=int, default=10000, help="Synthetic orders")
+    parser.add_argument("--feedback-rate", type=float, default=0.3, help="Share of delivered orders with feedback")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for item popularity")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per insert transaction")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; same seed, same data")
+    args = parser.parse_args()
 
+    if args.from_snapshot:
+        print(f"Restoring snapshot {args.from_snapshot}...")
+        migrations.restore(args.from_snapshot, engine)
+        ensure_schema(verbose=True)
+    elif args.reset:
+        print("Initializing database...")
+        init_db()
+    else:
+        print("Migrating database...")
+        ensure_schema(verbose=True)
+
+    if args.from_snapshot:
+        print("Snapshot restored, skipping seeding.")
+    elif args.synthetic:
+        import synthetic
+        print("\nGenerating synthetic data...")
+        synthetic.generate(engine, restaurants=args.restaurants, items_per_restaurant=args.items,
+                           users=args.users, orders=args.orders, feedback_rate=args.feedback_rate,
+                           skew=args.skew, batch_size=args.batch_size, seed=args.seed)
+    else:
+        print("\nSeeding database with sample data...")
+        seed_db()
+    if args.snapshot:
+        migrations.snapshot(engine, args.snapshot)
+        print(f"\nSnapshot saved to {args.snapshot}")
+    print("\nSetup complete! Run 'flask --app app.py run' to start the server.")
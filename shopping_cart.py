@@ -0,0 +1,172 @@
+"""
+Cart writes for Portkey app.
+
+A cart line is unique per owner (user, or anonymous session) and menu item,
+so adding an item is a single UPSERT: the first add inserts the line and
+every later add merges its quantity into it inside the database. A burst of
+taps on "add" never reads the line first and can't create duplicate lines.
+
+Stock is held while an item sits in a cart: adding takes it, lowering a
+line's quantity or removing the line gives it back.
+"""
+
+from sqlalchemy import case, delete, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import CartItem, MenuItem
+from pricing import inr_paise, line_total_paise
+import cache
+import catalog
+
+MAX_QUANTITY = 20  # Per cart line
+
+# Line count shown in every page header, per cart owner
+cart_counts = cache.Cache('cart_counts', max_size=10000, ttl=300, shared=True)
+
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class CartConflict(ValueError):
+    """Raised when stock or a concurrent change to the line prevents an update."""
+
+
+def owner_filter(user_id=None, session_id=None):
+    """Filter for the cart lines of a logged-in user or an anonymous session."""
+    return CartItem.user_id == user_id if user_id else CartItem.session_id == session_id
+
+
+def owner_tag(user_id=None, session_id=None):
+    """Cache tag for everything derived from one cart."""
+    return f'cart:user:{user_id}' if user_id else f'cart:session:{session_id}'
+
+
+def forget_cart(user_id=None, session_id=None):
+    """Retire cached data about a cart after a change to it commits."""
+    cache.invalidate(owner_tag(user_id, session_id))
+
+
+def _line_filter(menu_item_id, user_id, session_id):
+    return owner_filter(user_id, session_id), CartItem.menu_item_id == menu_item_id
+
+
+def _log_stock_change(db, menu_item):
+    catalog.log_changes(db.connection(), [('menu_item', menu_item.id, menu_item.restaurant_id, 'upsert')])
+
+
+def _take_stock(db, menu_item, amount):
+    """Conditionally take `amount` (a number or SQL expression); returns how much was taken, or None."""
+    amount = literal(amount) if isinstance(amount, int) else amount
+    row = db.execute(update(MenuItem).where(
+        MenuItem.id == menu_item.id, MenuItem.availability.is_(True), MenuItem.stock_quantity >= amount
+    ).values(stock_quantity=MenuItem.stock_quantity - amount).returning(MenuItem.stock_quantity, amount)).first()
+    if row is None:
+        return None
+    left, taken = row
+    if left == 0 and taken:
+        _log_stock_change(db, menu_item)
+    return taken
+
+
+def reserve_stock(db, menu_item, quantity):
+    """Take `quantity` from stock if it is all there; returns whether it was taken.
+
+    A conditional UPDATE, so concurrent adds can't oversell. Bypasses the ORM,
+    so selling out is logged here (like the ORM, other stock counts aren't)
+    and the caller must call catalog.touch([menu_item.restaurant_id]) after committing.
+    """
+    return _take_stock(db, menu_item, quantity) is not None
+
+
+def release_stock(db, menu_item, quantity):
+    """Give `quantity` back to stock; the caller touches the catalog as for reserve_stock()."""
+    now = db.execute(update(MenuItem).where(MenuItem.id == menu_item.id).values(
+        stock_quantity=MenuItem.stock_quantity + quantity).returning(MenuItem.stock_quantity)).scalar()
+    if now is not None and now > 0 and now - quantity <= 0:  # Back in stock
+        _log_stock_change(db, menu_item)
+
+
+def add_item(db, menu_item, quantity, user_id=None, session_id=None):
+    """Insert a cart line or add to the existing one, capped at MAX_QUANTITY, in one statement.
+
+    Returns the line's (quantity, unit_price) after the add.
+    """
+    insert = _INSERTS[db.get_bind().dialect.name]
+    owner = CartItem.user_id if user_id else CartItem.session_id
+    statement = insert(CartItem).values(
+        user_id=user_id, session_id=None if user_id else session_id, menu_item_id=menu_item.id,
+        quantity=min(quantity, MAX_QUANTITY), unit_price=menu_item.price)
+    merged = CartItem.quantity + statement.excluded.quantity
+    return db.execute(statement.on_conflict_do_update(
+        index_elements=[owner, CartItem.menu_item_id],
+        index_where=owner.isnot(None),  # Matches the partial unique index
+        set_={'quantity': case((merged > MAX_QUANTITY, MAX_QUANTITY), else_=merged)},
+    ).returning(CartItem.quantity, CartItem.unit_price)).one()
+
+
+def reserve_and_add(db, menu_item, quantity, user_id=None, session_id=None):
+    """Take stock for `quantity` more of an item and add it to the cart line.
+
+    Only what fits under MAX_QUANTITY is taken: the stock UPDATE reads the
+    line's quantity in a subquery, so an add is two statements, the stock
+    update and the upsert. Returns the line's (quantity, unit_price), or None
+    (and changes nothing) if stock is short.
+    """
+    current = select(CartItem.quantity).where(*_line_filter(menu_item.id, user_id, session_id)).scalar_subquery()
+    room = MAX_QUANTITY - func.coalesce(current, 0)
+    fits = case((room <= 0, 0), (room < quantity, room), else_=quantity)
+    # The stock update holds the menu item row (in SQLite, the whole database)
+    # until commit, so no other add can change the line before the upsert
+    taken = _take_stock(db, menu_item, fits)
+    if taken is None:
+        return None
+    return add_item(db, menu_item, taken, user_id=user_id, session_id=session_id)
+
+
+def set_quantity(db, menu_item, quantity, user_id=None, session_id=None):
+    """Set an existing line's quantity, moving the difference in or out of stock.
+
+    Returns the line's (quantity, unit_price), or None if the item isn't in the cart.
+    """
+    filters = _line_filter(menu_item.id, user_id, session_id)
+    line = db.query(CartItem.quantity, CartItem.unit_price).filter(*filters).first()
+    if line is None:
+        return None
+    quantity = max(1, min(quantity, MAX_QUANTITY))
+    difference = quantity - line.quantity
+    if difference > 0 and not reserve_stock(db, menu_item, difference):
+        raise CartConflict(f'Only {menu_item.stock_quantity} more available in stock')
+    if difference < 0:
+        release_stock(db, menu_item, -difference)
+    # Only applies if nothing changed the line since we read it, keeping stock exact
+    if not db.execute(update(CartItem).where(*filters, CartItem.quantity == line.quantity)
+                      .values(quantity=quantity)).rowcount:
+        raise CartConflict('The cart changed, please retry')
+    return quantity, line.unit_price
+
+
+def remove_item(db, menu_item, user_id=None, session_id=None):
+    """Delete a line and return its stock; returns whether there was a line."""
+    removed = db.execute(delete(CartItem).where(*_line_filter(menu_item.id, user_id, session_id))
+                         .returning(CartItem.quantity)).scalar()
+    if removed is None:
+        return False
+    release_stock(db, menu_item, removed)
+    return True
+
+
+def line_json(menu_item_id, quantity, unit_price):
+    """Compact JSON for one cart line."""
+    return {'menu_item_id': menu_item_id, 'quantity': quantity,
+            'unit_price_inr_paise': inr_paise(unit_price),
+            'subtotal_inr_paise': line_total_paise(unit_price, quantity)}
+
+
+def lines(db, user_id=None, session_id=None):
+    """Every line in a cart as line_json() dicts, oldest first."""
+    rows = db.query(CartItem.menu_item_id, CartItem.quantity, CartItem.unit_price).filter(
+        owner_filter(user_id, session_id)).order_by(CartItem.id)
+    return [line_json(*row) for row in rows]
+
+
+def totals(cart_lines):
+    """Line count and total in paise for a cart."""
+    return {'count': len(cart_lines), 'total_inr_paise': sum(line['subtotal_inr_paise'] for line in cart_lines)}
@@ -0,0 +1,150 @@
+"""Slow query log for Portkey app.
+
+Statements slower than a threshold are logged with their bound parameters and
+the database's query plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on Postgres).
+Logging is sampled and rate limited so it can stay on in production. Set
+PORTKEY_SLOW_QUERY_LOG to also append each entry as a JSON line to a file.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event
+import metrics
+
+logger = logging.getLogger('portkey.slowlog')
+
+SLOW_QUERY_MS = float(os.getenv('PORTKEY_SLOW_QUERY_MS', '250'))
+SAMPLE_RATE = float(os.getenv('PORTKEY_SLOW_QUERY_SAMPLE', '1.0'))
+MAX_PER_MINUTE = int(os.getenv('PORTKEY_SLOW_QUERY_MAX_PER_MINUTE', '10'))
+LOG_PATH = os.getenv('PORTKEY_SLOW_QUERY_LOG')
+
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+SENSITIVE_WORDS = ('password', 'token', 'secret', 'email')
+
+slow_queries = metrics.registry.counter(
+    'portkey_slow_queries_total', 'SQL statements slower than the slow query threshold.', ('logged',))
+
+
+class RateLimiter:
+    """Allow at most `limit` events per `period` seconds."""
+
+    def __init__(self, limit, period=60.0):
+        self.limit = limit
+        self.period = period
+        self._window_start = time.monotonic()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.period:
+                self._window_start = now
+                self._count = 0
+            if self._count >= self.limit:
+                return False
+            self._count += 1
+            return True
+
+
+def explain(cursor, dialect_name, statement, parameters):
+    """Capture the query plan for a statement on the same DBAPI connection.
+
+    On Postgres a failed statement aborts the whole transaction, so EXPLAIN
+    runs inside a savepoint and a failure only rolls back to it.
+    """
+    prefix = EXPLAIN_PREFIXES.get(dialect_name)
+    if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    savepoint = dialect_name != 'sqlite'
+    plan_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            try:
+                plan_cursor.execute('SAVEPOINT slowlog_explain')
+            except Exception:
+                savepoint = False  # Autocommit: no transaction to protect
+        plan_cursor.execute(prefix + statement, parameters)
+        # SQLite rows are (id, parent, notused, detail); Postgres rows are (line,)
+        plan = [str(row[-1]) for row in plan_cursor.fetchall()]
+        if savepoint:
+            plan_cursor.execute('RELEASE SAVEPOINT slowlog_explain')
+        return plan
+    except Exception as e:
+        if savepoint:
+            plan_cursor.execute('ROLLBACK TO SAVEPOINT slowlog_explain')
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        plan_cursor.close()
+
+
+def redact(statement, parameters):
+    """Hide bound parameters of statements touching sensitive columns."""
+    if any(word in statement.lower() for word in SENSITIVE_WORDS):
+        return '<redacted>'
+    return parameters
+
+
+def format_parameters(parameters):
+    """Shorten bound parameters for the log line."""
+    if isinstance(parameters, (list, tuple)):
+        return [repr(value)[:200] for value in parameters]
+    if isinstance(parameters, dict):
+        return {key: repr(value)[:200] for key, value in parameters.items()}
+    return repr(parameters)[:200]
+
+
+def write_entry(entry):
+    """Log a slow query entry, and append it to LOG_PATH when configured."""
+    plan = '\n    '.join(entry['plan'] or ['(no plan)'])
+    logger.warning("Slow query (%.1f ms): %s\n  params: %s\n  plan:\n    %s",
+                   entry['duration_ms'], entry['statement'], format_parameters(entry['parameters']), plan)
+    if LOG_PATH:
+        with open(LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+
+def install(engine, threshold_ms=None, sample_rate=None, max_per_minute=None):
+    """Watch an engine for slow statements."""
+    threshold = (SLOW_QUERY_MS if threshold_ms is None else threshold_ms) / 1000.0
+    sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    limiter = RateLimiter(MAX_PER_MINUTE if max_per_minute is None else max_per_minute)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slowlog_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _check_duration(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slowlog_start'].pop()
+        if elapsed < threshold:
+            return
+        if random.random() >= sample_rate or not limiter.allow():
+            slow_queries.inc('false')
+            return
+        slow_queries.inc('true')
+
+        # executemany: one parameter set is representative for the plan
+        explain_parameters = parameters[0] if executemany and parameters else parameters
+        write_entry({
+            'timestamp': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'statement': statement,
+            'parameters': redact(statement, explain_parameters),
+            'executemany': executemany,
+            'plan': explain(cursor, conn.dialect.name, statement, explain_parameters),
+        })
+
+    @event.listens_for(engine, 'handle_error')
+    def _discard_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('slowlog_start'):
+            conn.info['slowlog_start'].pop()
+
+    return engine
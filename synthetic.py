@@ -0,0 +1,282 @@
+"""
+Synthetic data generator for Portkey app.
+
+Generates large, realistic datasets (restaurants, menus, users, carts,
+orders with skewed item popularity, feedback) for benchmarks and index
+tuning. Rows are streamed in batches and written with executemany inserts,
+one transaction per batch, so memory stays flat even at millions of orders.
+Core inserts skip the ORM hook behind the catalog change log, so restaurant
+and menu item batches log their own changes. The same seed always produces
+the same data.
+"""
+
+import math
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import insert, func, select
+from models import Restaurant, MenuItem, User, CartItem, Order, OrderItem, Feedback, DeliveryFeedback
+from pricing import line_total_paise, paise_to_inr
+import catalog
+
+CUISINES = ('Indian', 'Chinese', 'Italian', 'South Indian', 'Coastal Seafood', 'Vegetarian', 'Cafe', 'Barbeque')
+CATEGORIES = ('Starters', 'Main Course', 'Breads', 'Desserts', 'Beverages')
+DISHES = ('Masala Dosa', 'Butter Chicken', 'Hakka Noodles', 'Margherita Pizza', 'Fish Curry', 'Paneer Tikka',
+          'Ghee Roast', 'Biryani', 'Gobi Manchurian', 'Filter Coffee', 'Gulab Jamun', 'Neer Dosa', 'Pasta')
+AREAS = ('Manipal', 'Udupi', 'Mangalore', 'Kadri', 'Hampankatta', 'Malpe')
+COMMENTS = ('Great food!', 'Arrived hot and fresh.', 'A bit late but tasty.', 'Portions could be bigger.',
+            None, None, None)
+# The newest orders are still in progress; older ones are delivered or cancelled
+RECENT_STATUSES = ('confirmed', 'preparing', 'ready', 'out_for_delivery')
+PASSWORD_HASH = 'synthetic-user-cannot-login'
+
+
+class Progress:
+    """Prints throughput for a long-running table load."""
+
+    def __init__(self, table, total, enabled=True):
+        self.table = table
+        self.total = total
+        self.enabled = enabled
+        self.done = 0
+        self.started = time.perf_counter()
+        self._last_report = 0.0
+
+    def advance(self, rows):
+        self.done += rows
+        now = time.perf_counter()
+        if self.enabled and (now - self._last_report >= 1.0 or self.done >= self.total):
+            self._last_report = now
+            elapsed = max(now - self.started, 1e-9)
+            percent = self.done / self.total * 100 if self.total else 100.0
+            print(f"   {self.table}: {self.done:,}/{self.total:,} ({percent:.0f}%) "
+                  f"{self.done / elapsed:,.0f} rows/s", flush=True)
+
+
+def zipf_cum_weights(n, skew):
+    """Cumulative Zipf weights for ranks 1..n; a few entries get most picks."""
+    return list(accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def pick(rng, cum_weights):
+    """Pick an index according to cumulative weights."""
+    return bisect_left(cum_weights, rng.random() * cum_weights[-1])
+
+
+class Generator:
+    """Generates and inserts one synthetic dataset."""
+
+    def __init__(self, engine, restaurants=100, items_per_restaurant=20, users=1000, orders=10000,
+                 cart_rate=0.1, feedback_rate=0.3, skew=1.1, days=365, seed=42, batch_size=5000,
+                 username_prefix='user', password_hash=PASSWORD_HASH, progress=True):
+        self.engine = engine
+        self.restaurants = restaurants
+        self.items_per_restaurant = items_per_restaurant
+        self.users = users
+        self.orders = orders
+        self.cart_rate = cart_rate
+        self.feedback_rate = feedback_rate
+        self.skew = skew
+        self.days = days
+        self.batch_size = batch_size
+        self.username_prefix = username_prefix
+        self.password_hash = password_hash
+        self.progress = progress
+        self.rng = random.Random(seed)
+        self.now = datetime(2025, 1, 1) + timedelta(days=days)  # Fixed, so output is reproducible
+        self.prices = []  # USD price per generated menu item, by position
+
+    def run(self):
+        """Generate every table in dependency order."""
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            sqlite = conn.dialect.name == 'sqlite'
+            if sqlite:
+                # Bulk loads don't need an fsync per batch; restored once loading finishes or fails
+                conn.exec_driver_sql('PRAGMA synchronous = OFF')
+            try:
+                self.conn = conn
+                self.offsets = {model: self._max_id(model) for model in (Restaurant, MenuItem, User, Order)}
+                conn.commit()  # End the autobegun transaction; each batch commits on its own
+                self._load(Restaurant, self.restaurants, self._restaurant_rows())
+                self._load(MenuItem, self.restaurants * self.items_per_restaurant, self._menu_item_rows())
+                self._load(User, self.users, self._user_rows())
+                self._load(CartItem, int(self.users * self.cart_rate), self._cart_rows())
+                self._generate_orders()
+            finally:
+                if sqlite:
+                    if conn.in_transaction():
+                        conn.rollback()
+                    conn.exec_driver_sql('PRAGMA synchronous = FULL')
+                    conn.commit()
+        if self.progress:
+            print(f"✅ Synthetic data generated in {time.perf_counter() - started:.1f}s")
+
+    def _max_id(self, model):
+        return self.conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+
+    def _load(self, model, total, rows):
+        """Insert rows from an iterator in batched transactions."""
+        progress = Progress(model.__tablename__, total, self.progress)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._insert(model, batch)
+                progress.advance(len(batch))
+                batch = []
+        if batch:
+            self._insert(model, batch)
+            progress.advance(len(batch))
+
+    def _insert(self, model, batch):
+        if model is Restaurant:
+            changes = [('restaurant', row['id'], row['id'], 'upsert') for row in batch]
+        elif model is MenuItem:
+            changes = [('menu_item', row['id'], row['restaurant_id'], 'upsert') for row in batch]
+        else:
+            changes = []
+        with self.conn.begin():
+            self.conn.execute(insert(model), batch)
+            catalog.log_changes(self.conn, changes)
+        if changes:
+            catalog.touch({change[2] for change in changes})
+
+    def _restaurant_rows(self):
+        base = self.offsets[Restaurant]
+        for n in range(1, self.restaurants + 1):
+            area = self.rng.choice(AREAS)
+            yield {
+                'id': base + n,
+                'name': f"{self.rng.choice(DISHES).split()[0]} House {base + n}",
+                'address': f"{self.rng.randint(1, 999)}, Main Road, {area}, Karnataka",
+                'contact': f"+91 {self.rng.randint(7000000000, 9999999999)}",
+                'operating_hours': self.rng.choice(('Mon-Sun: 7:00 AM - 10:00 PM', 'Mon-Sun: 11:00 AM - 11:00 PM')),
+                'cuisine_type': self.rng.choice(CUISINES),
+            }
+
+    def _menu_item_rows(self):
+        base = self.offsets[MenuItem]
+        restaurant_base = self.offsets[Restaurant]
+        for n in range(self.restaurants * self.items_per_restaurant):
+            # Log-normal prices: mostly cheap dishes with a long tail of expensive ones
+            price = round(min(max(self.rng.lognormvariate(math.log(6), 0.5), 1.0), 60.0), 2)
+            self.prices.append(price)
+            yield {
+                'id': base + n + 1,
+                'restaurant_id': restaurant_base + n // self.items_per_restaurant + 1,
+                'name': f"{self.rng.choice(DISHES)} #{n + 1}",
+                'description': 'Freshly prepared house favourite',
+                'price': price,
+                'category': self.rng.choice(CATEGORIES),
+                'availability': self.rng.random() > 0.05,
+                'stock_quantity': self.rng.randint(0, 200),
+            }
+
+    def _user_rows(self):
+        base = self.offsets[User]
+        for n in range(1, self.users + 1):
+            yield {
+                'id': base + n,
+                'username': f'{self.username_prefix}{base + n}',
+                'email': f'{self.username_prefix}{base + n}@example.com',
+                'password_hash': self.password_hash,
+                'created_at': self.now - timedelta(days=self.rng.uniform(0, self.days)),
+            }
+
+    def _random_item(self, restaurant_weights, item_weights):
+        """Pick a (restaurant index, item index) pair with skewed popularity."""
+        restaurant = pick(self.rng, restaurant_weights)
+        item = pick(self.rng, item_weights)
+        return restaurant, restaurant * self.items_per_restaurant + item
+
+    def _cart_rows(self):
+        restaurant_weights = zipf_cum_weights(self.restaurants, self.skew)
+        item_weights = zipf_cum_weights(self.items_per_restaurant, self.skew)
+        users = self.rng.sample(range(1, self.users + 1), int(self.users * self.cart_rate))
+        for user in users:
+            _, item = self._random_item(restaurant_weights, item_weights)
+            yield {
+                'user_id': self.offsets[User] + user,
+                'menu_item_id': self.offsets[MenuItem] + item + 1,
+                'quantity': self.rng.randint(1, 3),
+                'unit_price': self.prices[item],
+                'created_at': self.now - timedelta(minutes=self.rng.randint(0, 240)),
+            }
+
+    def _generate_orders(self):
+        """Stream orders with their items and feedback, batch by batch."""
+        restaurant_weights = zipf_cum_weights(self.restaurants, self.skew)
+        item_weights = zipf_cum_weights(self.items_per_restaurant, self.skew)
+        user_weights = zipf_cum_weights(self.users, 0.8)  # Some customers order far more often
+        progress = Progress('orders', self.orders, self.progress)
+        base = self.offsets[Order]
+
+        for start in range(0, self.orders, self.batch_size):
+            orders, order_items, feedback, delivery_feedback = [], [], [], []
+            for n in range(start, min(start + self.batch_size, self.orders)):
+                order_id = base + n + 1
+                user_id = self.offsets[User] + pick(self.rng, user_weights) + 1
+                # Lunch and dinner peaks on top of a uniform spread over `days`
+                day = self.now - timedelta(days=self.rng.uniform(0, self.days))
+                created_at = day.replace(hour=self.rng.choice((12, 13, 13, 14, 19, 20, 20, 21, self.rng.randint(7, 23))),
+                                         minute=self.rng.randint(0, 59))
+                if created_at > self.now:
+                    created_at -= timedelta(days=1)
+                age = self.now - created_at
+                status = self.rng.choice(RECENT_STATUSES) if age < timedelta(hours=1) else (
+                    'cancelled' if self.rng.random() < 0.03 else 'delivered')
+
+                restaurant, _ = self._random_item(restaurant_weights, item_weights)
+                total_paise = 0
+                for _ in range(self.rng.randint(1, 4)):
+                    item = restaurant * self.items_per_restaurant + pick(self.rng, item_weights)
+                    quantity = self.rng.choice((1, 1, 1, 2, 2, 3))
+                    unit_price = self.prices[item]
+                    total_paise += line_total_paise(unit_price, quantity)
+                    order_items.append({
+                        'order_id': order_id,
+                        'menu_item_id': self.offsets[MenuItem] + item + 1,
+                        'quantity': quantity,
+                        'unit_price': unit_price,
+                        'subtotal': round(unit_price * quantity, 2),
+                    })
+
+                orders.append({
+                    'id': order_id,
+                    'user_id': user_id,
+                    'total_amount': paise_to_inr(total_paise),
+                    'status': status,
+                    'delivery_address': None,
+                    'payment_id': f'synthetic_{order_id}',
+                    'created_at': created_at,
+                    'updated_at': created_at + timedelta(minutes=self.rng.randint(20, 60)) if status == 'delivered' else created_at,
+                })
+
+                if status == 'delivered' and self.rng.random() < self.feedback_rate:
+                    rating = self.rng.choices((1, 2, 3, 4, 5), weights=(3, 4, 10, 35, 48))[0]
+                    feedback.append({'order_id': order_id, 'user_id': user_id, 'rating': rating,
+                                     'comment': self.rng.choice(COMMENTS),
+                                     'created_at': created_at + timedelta(hours=1)})
+                    if self.rng.random() < 0.5:
+                        delivery_feedback.append({
+                            'order_id': order_id, 'user_id': user_id,
+                            'delivery_person_rating': min(5, max(1, rating + self.rng.randint(-1, 1))),
+                            'delivery_time_rating': self.rng.randint(2, 5),
+                            'comment': None, 'created_at': created_at + timedelta(hours=1)})
+
+            with self.conn.begin():
+                self.conn.execute(insert(Order), orders)
+                self.conn.execute(insert(OrderItem), order_items)
+                if feedback:
+                    self.conn.execute(insert(Feedback), feedback)
+                if delivery_feedback:
+                    self.conn.execute(insert(DeliveryFeedback), delivery_feedback)
+            progress.advance(len(orders))
+
+
+def generate(engine, **options):
+    """Generate a synthetic dataset; see Generator for the options."""
+    Generator(engine, **options).run()
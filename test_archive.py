@@ -0,0 +1,77 @@
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app
+import archive
+import chatbot
+from models import Base, DeliveryFeedback, Feedback, Order, OrderItem
+
+def test_archive_moves_old_finished_orders(monkeypatch, add_menu_item):
+    """Test that old finished orders move to monthly files in batches and still read back whole."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(archive, 'ReadSessionLocal', Session)
+    directory = tempfile.mkdtemp()
+
+    db = Session()
+    item = add_menu_item(db)
+    old = datetime.utcnow() - timedelta(days=400)
+    for n, (status, created_at) in enumerate([('delivered', old), ('cancelled', old - timedelta(days=40)),
+                                              ('delivered', old), ('preparing', old),
+                                              ('delivered', datetime.utcnow())]):
+        order = Order(user_id=7, total_amount=Decimal('5.00'), status=status, created_at=created_at,
+                      payment_id=f'pay_{n}')
+        order.order_items.append(OrderItem(menu_item_id=item.id, quantity=1, unit_price=Decimal('5.00'),
+                                           subtotal=Decimal('5.00')))
+        db.add(order)
+    db.flush()
+    first = db.query(Order).filter_by(payment_id='pay_0').one()
+    db.add(Feedback(order_id=first.id, user_id=7, rating=5, comment='Great'))
+    db.add(DeliveryFeedback(order_id=first.id, user_id=7, delivery_person_rating=4, delivery_time_rating=5))
+    db.commit()
+
+    assert archive.archive_orders(timedelta(days=365), batch_size=2, directory=directory, session_factory=Session) == 3
+    assert len(archive.archive_paths(directory)) == 2  # One file per month
+    assert {order.status for order in db.query(Order)} == {'preparing', 'delivered'}  # Active and recent stay
+    assert db.query(OrderItem).count() == 2 and db.query(Feedback).count() == 0
+
+    archived = archive.archived_orders(7, directory)
+    assert sorted(order.payment_id for order in archived) == ['pay_0', 'pay_1', 'pay_2']
+    assert archived[-1].payment_id == 'pay_1'  # Newest first
+    moved = next(order for order in archived if order.payment_id == 'pay_0')
+    assert moved.feedback.comment == 'Great' and moved.delivery_feedback.delivery_person_rating == 4
+    data = moved.to_dict()
+    assert data['order_items'][0]['menu_item']['restaurant_name'] == 'Dollops'
+    assert archive.archive_orders(timedelta(days=365), directory=directory, session_factory=Session) == 0
+
+    # The newest order stays even once it is old, so SQLite never reuses an archived id. Feedback ids
+    # can be reused, so the copy into pay_0's month file must not touch pay_0's feedback
+    db.query(Order).update({'created_at': old, 'status': 'delivered'})
+    late = db.query(Order).filter_by(payment_id='pay_3').one()
+    late.feedback = Feedback(user_id=7, rating=2, comment='Late')
+    db.commit()
+    assert late.feedback.id == moved.feedback.id
+    assert archive.archive_orders(timedelta(days=365), directory=directory, session_factory=Session) == 1
+    assert [order.payment_id for order in db.query(Order)] == ['pay_4']
+    comments = {order.payment_id: order.feedback and order.feedback.comment
+                for order in archive.archived_orders(7, directory)}
+    assert comments == {'pay_0': 'Great', 'pay_1': None, 'pay_2': None, 'pay_3': 'Late'}
+    assert [order.payment_id for order in archive.archived_orders(7, directory, order_id=moved.id)] == ['pay_0']
+
+    # Order history and the chatbot read through to the archive
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', directory)
+    monkeypatch.setattr(chatbot, 'ReadSessionLocal', Session)
+    history = [order.payment_id for order in app.order_history(db, 7)]
+    assert history[0] == 'pay_4' and history[-1] == 'pay_1' and len(history) == 5  # Newest first
+    assert f'#{moved.id} ' in chatbot.Chatbot().get_order_status(7, moved.id)
+
+    archive.delete_user_orders(7, directory)
+    assert archive.archived_orders(7, directory) == []
+
+    print('✅ Order archive test completed successfully!')
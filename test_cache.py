@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import cache
+
+def test_local_tier_lru_and_ttl():
+    """Test LRU eviction, expiry and per-namespace stats of the in-process tier."""
+
+    local = cache.Cache('test-local', max_size=2)
+    local.set('a', 1)
+    local.set('b', 2)
+    assert local.get('a') == 1
+    local.set('c', 3)  # Evicts 'b', the least recently used
+    assert 'b' not in local and len(local) == 2
+    assert local.get('b', 'missing') == 'missing'
+
+    local.set('short', 'x', ttl=0.01)
+    time.sleep(0.02)
+    assert local.get('short') is None
+
+    stats = local.stats()
+    assert (stats['hits'], stats['misses'], stats['max_size']) == (1, 2, 2)
+
+    print('✅ Local cache tier test completed successfully!')
+
+def test_shared_tier_and_tags(monkeypatch):
+    """Test that workers share entries through SQLite and tag invalidation retires them everywhere."""
+
+    for store in (cache.MemoryStore(), cache.SQLiteStore(os.path.join(tempfile.mkdtemp(), 'cache.db'))):
+        # Tags are versioned in the shared store, as with PORTKEY_CACHE_DB set
+        monkeypatch.setattr(cache, '_tag_store', store)
+        monkeypatch.setattr(cache, '_tag_versions', {})
+        worker_1 = cache.Cache('test-shared', shared=store)
+        worker_2 = cache.Cache('test-shared', shared=store)
+        worker_1.set(('order', 1), 'preparing', tags=('orders:1',))
+        worker_1.set(('order', 2), 'delivered', tags=('orders:2',))
+
+        assert worker_2.get(('order', 1)) == 'preparing'
+        assert worker_2.stats()['shared_hits'] == 1
+
+        cache.invalidate('orders:1')
+        assert store.tag_versions(['orders:1', 'orders:2']) == {'orders:1': 1, 'orders:2': 0}
+        cache._tag_versions.clear()  # As another worker, with nothing looked up yet
+        assert worker_1.get(('order', 1)) is None
+        assert worker_2.get(('order', 1)) is None
+        assert worker_2.get(('order', 2)) == 'delivered'
+
+        worker_1.clear()
+        assert store.get("test-shared:('order', 2)") is None
+
+    print('✅ Shared cache tier test completed successfully!')
+
+def test_shared_tier_errors_fall_back(monkeypatch):
+    """Test that a failing shared tier is logged and the local tier keeps working."""
+
+    class LockedStore:
+        def locked(self, *args):
+            raise sqlite3.OperationalError('database is locked')
+        get = set = delete = clear = tag_versions = bump = locked
+
+    store = LockedStore()
+    monkeypatch.setattr(cache, '_tag_store', store)
+    monkeypatch.setattr(cache, '_tag_versions', {})
+    shared = cache.Cache('test-locked', shared=store)
+
+    shared.set('count', 3)
+    assert shared.get('count') == 3
+    cache.invalidate('cart:user:1')  # Doesn't raise after the caller's commit
+    loads = []
+    for _ in range(2):
+        assert shared.get_or_set('tagged', lambda: loads.append(1) or 'fresh', tags=('cart:user:1',)) == 'fresh'
+    assert len(loads) == 2  # Tags can't be checked, so tagged entries are never served
+
+    print('✅ Shared cache fallback test completed successfully!')
+
+def test_single_flight():
+    """Test that concurrent misses for one key run the loader once."""
+
+    flights = cache.Cache('test-flight')
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return 'menu'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.get_or_set('menu', load))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['menu'] * 5 and len(calls) == 1
+    assert flights.stats()['loads'] == 1
+
+    # A tag invalidated while loading retires the loaded value
+    def stale_load():
+        cache.invalidate('menu:1')
+        return 'old'
+    assert flights.get_or_set('menu:1', stale_load, tags=('menu:1',)) == 'old'
+    assert flights.get_or_set('menu:1', lambda: 'new', tags=('menu:1',)) == 'new'
+
+    print('✅ Single-flight test completed successfully!')
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app
+import catalog
+from cache import Cache
+from models import Base, CatalogChange, MenuItem
+
+def make_client(monkeypatch, add_menu_item):
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'catalog.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(catalog, 'SessionLocal', Session)
+    monkeypatch.setattr(catalog, 'version_cache', Cache('test-catalog-versions'))
+    monkeypatch.setattr(catalog, 'catalog_cache', Cache('test-catalog-payloads'))
+    monkeypatch.setattr(app, '_started', True)
+
+    db = Session()
+    restaurant_id = add_menu_item(db).restaurant_id
+    add_menu_item(db, name='Neer Dosa', price=1.0)
+    db.close()
+    return app.app.test_client(), Session, restaurant_id
+
+def test_restaurant_and_menu_api(monkeypatch, add_menu_item):
+    """Test field selection, 304 revalidation and 404s of the catalog endpoints."""
+
+    client, Session, restaurant_id = make_client(monkeypatch, add_menu_item)
+
+    response = client.get('/api/restaurants?fields=id,name')
+    assert response.get_json()['restaurants'] == [{'id': restaurant_id, 'name': 'Dollops'}]
+    assert client.get('/api/restaurants?fields=id,password').status_code == 400
+    etag = response.headers['ETag']
+    assert client.get('/api/restaurants?fields=id,name', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/restaurants', headers={'If-None-Match': etag}).status_code == 200  # Other fields
+
+    menu = client.get(f'/api/restaurants/{restaurant_id}/menu?fields=name,price_inr_paise')
+    assert menu.get_json()['items'] == [{'name': 'Ghee Roast', 'price_inr_paise': 41500},
+                                        {'name': 'Neer Dosa', 'price_inr_paise': 8300}]
+    menu_etag = menu.headers['ETag']
+    assert client.get(f'/api/restaurants/{restaurant_id}/menu?fields=name,price_inr_paise',
+                      headers={'If-None-Match': menu_etag}).status_code == 304
+    assert client.get('/api/restaurants/999/menu').status_code == 404
+
+    # Stock counts aren't versioned, so they come uncached from their own endpoint
+    assert 'stock_quantity' not in client.get(f'/api/restaurants/{restaurant_id}/menu').get_json()['items'][0]
+    db = Session()
+    db.query(MenuItem).filter_by(name='Ghee Roast').one().stock_quantity = 10
+    db.commit()
+    db.close()
+    stock = client.get(f'/api/restaurants/{restaurant_id}/stock')
+    assert [item['stock_quantity'] for item in stock.get_json()['items']] == [10, 100]
+    assert stock.headers['Cache-Control'] == 'public, no-store'
+    assert client.get('/api/restaurants/999/stock').status_code == 404
+
+    # A menu change retires the old validators
+    db = Session()
+    db.query(MenuItem).filter_by(name='Neer Dosa').one().price = 1.5
+    db.commit()
+    db.close()
+    assert client.get(f'/api/restaurants/{restaurant_id}/menu?fields=name,price_inr_paise',
+                      headers={'If-None-Match': menu_etag}).status_code == 200
+    assert client.get('/api/restaurants?fields=id,name', headers={'If-None-Match': etag}).status_code == 200
+
+    print('✅ Catalog API test completed successfully!')
+
+def test_catalog_changes_api(monkeypatch, add_menu_item):
+    """Test paging through catalog changes, deleted items, and 410 for unknown or pruned versions."""
+
+    client, Session, restaurant_id = make_client(monkeypatch, add_menu_item)
+
+    first = client.get('/api/catalog/changes?since=0&limit=2').get_json()
+    assert first['has_more'] and first['version'] == 2
+    assert [restaurant['id'] for restaurant in first['restaurants']] == [restaurant_id]
+    rest = client.get(f"/api/catalog/changes?since={first['version']}").get_json()
+    assert not rest['has_more'] and [item['name'] for item in rest['menu_items']] == ['Neer Dosa']
+
+    db = Session()
+    item = db.query(MenuItem).filter_by(name='Ghee Roast').one()
+    item_id = item.id
+    db.delete(item)
+    db.commit()
+    delta = client.get(f"/api/catalog/changes?since={rest['version']}").get_json()
+    assert delta['deleted'] == {'restaurants': [], 'menu_items': [item_id]} and delta['menu_items'] == []
+
+    assert client.get('/api/catalog/changes?limit=0').status_code == 400
+    assert client.get(f"/api/catalog/changes?since={delta['version'] + 1}").status_code == 410
+
+    db.query(CatalogChange).update({'changed_at': datetime(2020, 1, 1)})
+    db.commit()
+    db.close()
+    assert catalog.prune_changes(session_factory=Session)
+    response = client.get('/api/catalog/changes?since=0')
+    assert response.status_code == 410 and 'version' in response.get_json()
+
+    print('✅ Catalog changes API test completed successfully!')
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import chatbot as chatbot_module
+from chatbot import Chatbot
+from models import Base, Order
+
+def test_intent_cache():
+    """Test that repeated messages reuse the cached intent classification."""
+
+    bot = Chatbot(intent_cache_size=2)
+
+    first = bot.get_response('Hello')
+    second = bot.get_response('  hello ')
+    assert first['intent'] == second['intent'] == 'greetings'
+
+    stats = bot.get_cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+    # Oldest entry is evicted once the cache is full
+    bot.get_response('how do I pay')
+    bot.get_response('bye')
+    assert 'hello' not in bot.intent_cache
+    assert len(bot.intent_cache) == 2
+
+    print('✅ Intent cache test completed successfully!')
+
+def test_intent_cache_keeps_context():
+    """Test that cached intents still get context-aware responses."""
+
+    bot = Chatbot()
+    bot.get_response('hello', 'user-1')
+    bot.get_response('show me restaurants', 'user-1')
+    response = bot.get_response('hello', 'user-1')
+
+    assert bot.get_cache_stats()['hits'] == 1
+    assert 'I remember you were looking at restaurants' in response['response']
+
+    print('✅ Intent cache context test completed successfully!')
+
+def test_order_status_intent(monkeypatch):
+    """Test that order status questions answer from a short-lived per-user cache."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(chatbot_module, 'ReadSessionLocal', Session)
+    db = Session()
+    db.add_all([Order(id=7, user_id=1, total_amount=100, status='delivered', created_at=datetime(2025, 1, 1)),
+                Order(id=8, user_id=1, total_amount=200, status='preparing', created_at=datetime(2025, 1, 2)),
+                Order(id=9, user_id=2, total_amount=300, status='confirmed', created_at=datetime(2025, 1, 3))])
+    db.commit()
+
+    bot = Chatbot()
+    response = bot.get_response('Where is my order?', 'user-1', customer_id=1)
+    assert response['intent'] == 'order_status'
+    assert '#8' in response['response'] and 'being prepared' in response['response']
+    assert '#7' in bot.get_response('status of order #7', 'user-1', customer_id=1)['response']
+    assert "couldn't find order #9" in bot.get_response('track order 9', 'user-1', customer_id=1)['response']
+    assert 'log in' in bot.get_response('where is my order', 'session-abc')['response']
+    for message in ('I want to order 2 pizzas', 'can I order 3 dosas'):
+        assert bot.get_response(message, 'user-1', customer_id=1)['intent'] != 'order_status'
+
+    # Cached until the customer's orders change
+    db.query(Order).filter_by(id=8).update({'status': 'out_for_delivery'})
+    db.commit()
+    assert 'being prepared' in bot.get_response('where is my food', 'user-1', customer_id=1)['response']
+    assert bot.get_order_status_stats()['hits'] == 1
+    bot.forget_order_status(1)
+    assert 'out for delivery' in bot.get_response('where is my food', 'user-1', customer_id=1)['response']
+    db.close()
+
+    print('✅ Order status intent test completed successfully!')
+
+if __name__ == '__main__':
+    test_intent_cache()
+    test_intent_cache_keeps_context()
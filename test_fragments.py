@@ -0,0 +1,121 @@
+import os
+import tempfile
+from datetime import datetime
+
+from jinja2 import Environment
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import catalog
+from fragments import FragmentCacheExtension, Deferred, fragment_cache
+from models import Base, Restaurant, MenuItem, CatalogChange
+
+def test_fragment_cache():
+    """Test that cached blocks render once per key while the rest of the page stays live."""
+
+    env = Environment(extensions=[FragmentCacheExtension])
+    template = env.from_string(
+        "{{ cart_count }}|{% cache 'menu', 1, version %}"
+        "{% for item in items %}{{ item }},{% endfor %}{% endcache %}"
+    )
+    fragment_cache.clear()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return ['dosa', 'idli']
+
+    assert template.render(cart_count=0, version=1, items=Deferred(load)) == '0|dosa,idli,'
+    assert template.render(cart_count=3, version=1, items=Deferred(load)) == '3|dosa,idli,'
+    assert len(loads) == 1
+
+    # A new catalog version renders the block again
+    assert template.render(cart_count=3, version=2, items=Deferred(load)) == '3|dosa,idli,'
+    assert len(loads) == 2
+
+    print('✅ Fragment cache test completed successfully!')
+
+def test_catalog_version_bumps_on_commit():
+    """Test that committed menu changes are logged and bump the restaurant's catalog version."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    try:
+        restaurant = Restaurant(name='Test', address='Manipal', contact='0',
+                                operating_hours='24x7', cuisine_type='Cafe')
+        db.add(restaurant)
+        db.flush()
+        item = MenuItem(restaurant_id=restaurant.id, name='Tea', description='Hot tea',
+                        price=1.00, category='Beverages')
+        db.add(item)
+        db.commit()
+
+        version, _ = catalog.restaurant_version(restaurant.id, db)
+        assert version == 2  # Restaurant and menu item inserts
+        item.price = 1.50
+        db.flush()
+        db.rollback()
+        assert catalog.restaurant_version(restaurant.id, db)[0] == version
+
+        item.price = 1.50
+        db.commit()
+        assert catalog.restaurant_version(restaurant.id, db)[0] == version + 1
+        assert catalog.catalog_version(db)[0] == version + 1
+
+        # Stock counts only make a version when the item sells out or comes back
+        item.stock_quantity -= 1
+        db.commit()
+        assert catalog.restaurant_version(restaurant.id, db)[0] == version + 1
+        item.stock_quantity = 0
+        db.commit()
+        assert catalog.restaurant_version(restaurant.id, db)[0] == version + 2
+
+        changes = db.query(CatalogChange).order_by(CatalogChange.id).all()
+        assert [(c.entity, c.operation) for c in changes] == [
+            ('restaurant', 'upsert'), ('menu_item', 'upsert'), ('menu_item', 'upsert'), ('menu_item', 'upsert')
+        ]
+    finally:
+        db.close()
+
+    print('✅ Catalog version test completed successfully!')
+
+def test_prune_changes(monkeypatch):
+    """Test that pruning keeps each restaurant's version and turns away clients synced before it."""
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'catalog.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(catalog, 'SessionLocal', Session)
+
+    db = Session()
+    restaurants = [Restaurant(name=name, address='Manipal', contact='0', operating_hours='24x7', cuisine_type='Cafe')
+                   for name in ('Old', 'Busy')]
+    db.add_all(restaurants)
+    db.commit()
+    for price in (1.0, 2.0, 3.0):
+        db.add(MenuItem(restaurant_id=restaurants[1].id, name=f'Item {price}', description='x', price=price,
+                        category='Snacks'))
+        db.commit()
+    ids = [restaurant.id for restaurant in restaurants]
+    versions = [catalog.restaurant_version(restaurant_id, db)[0] for restaurant_id in ids]
+    db.query(CatalogChange).update({'changed_at': datetime(2020, 1, 1)})
+    db.commit()
+    db.close()
+
+    assert catalog.prune_changes(session_factory=Session) == 3  # Everything but each restaurant's latest row
+    db = Session()
+    assert [catalog.restaurant_version(restaurant_id, db)[0] for restaurant_id in ids] == versions
+    db.close()
+    current = catalog.catalog_version(Session())[0]
+    assert catalog.changes_since(0) is None and catalog.changes_since(versions[1] - 1) is None
+    assert catalog.changes_since(versions[1])['version'] == current
+    assert catalog.prune_changes(session_factory=Session) == 0
+
+    print('✅ Catalog change pruning test completed successfully!')
+
+if __name__ == '__main__':
+    test_fragment_cache()
+    test_catalog_version_bumps_on_commit()
@@ -0,0 +1,70 @@
+import gzip
+import os
+import tempfile
+
+from flask import Flask, jsonify
+
+import http_cache
+
+def create_test_app(static_folder):
+    """Create a small app with the caching layer installed."""
+
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+
+    @app.route('/api/items')
+    def items():
+        return jsonify([{'id': i, 'name': f'Item {i}'} for i in range(200)])
+
+    @app.route('/api/tiny')
+    def tiny():
+        return jsonify({'ok': True})
+
+    return http_cache.init_app(app)
+
+def test_etag_and_compression():
+    """Test weak ETags, 304 revalidation and gzip above the size threshold."""
+
+    with tempfile.TemporaryDirectory() as static_folder:
+        client = create_test_app(static_folder).test_client()
+
+        response = client.get('/api/items', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Cache-Control'] == http_cache.DEFAULT_POLICY
+        assert b'Item 199' in gzip.decompress(response.data)
+        etag = response.headers['ETag']
+        assert etag.startswith('W/')
+
+        response = client.get('/api/items', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+        response = client.get('/api/tiny', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    print('✅ HTTP cache test completed successfully!')
+
+def test_static_precompression():
+    """Test that static files are compressed once and reused until they change."""
+
+    with tempfile.TemporaryDirectory() as static_folder:
+        path = os.path.join(static_folder, 'app.js')
+        with open(path, 'w') as f:
+            f.write('console.log("portkey");\n' * 200)
+
+        client = create_test_app(static_folder).test_client()
+        first = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip'})
+        second = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip'})
+        first.close()
+        second.close()
+
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert first.headers['Cache-Control'] == http_cache.CACHE_POLICIES['static']
+        assert gzip.decompress(second.data).startswith(b'console.log')
+        assert len([key for key in http_cache._static_cache if key[0] == path]) == 1
+
+    print('✅ Static precompression test completed successfully!')
+
+if __name__ == '__main__':
+    test_etag_and_compression()
+    test_static_precompression()
@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import index_advisor
+from models import Base, CartItem, MenuItem, Order
+
+def test_hot_queries_use_composite_indexes():
+    """Test that the cart, order history and menu sample queries are served by their composite indexes."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    with index_advisor.record(engine) as entries:
+        db.query(CartItem).filter_by(menu_item_id=1).filter_by(user_id=1).first()
+        db.query(CartItem).filter_by(menu_item_id=1).filter_by(session_id='abc').first()
+        db.query(Order).filter_by(user_id=1).order_by(Order.created_at.desc()).all()
+        db.query(MenuItem).filter(MenuItem.availability == True, MenuItem.stock_quantity > 0).limit(8).all()
+        db.query(Order.id, Order.status, Order.created_at).filter(Order.user_id == 1).order_by(
+            Order.created_at.desc()).first()
+    db.close()
+
+    reports, unused = index_advisor.analyze(engine, entries)
+    indexes = [report['indexes'] for report in reports]
+    assert ['ix_cart_items_user_id_menu_item_id'] in indexes
+    assert ['ix_cart_items_session_id_menu_item_id'] in indexes
+    assert ['ix_menu_items_availability_stock_quantity'] in indexes
+
+    history = next(report for report in reports if report['statement'].startswith('SELECT orders.id AS orders_id, orders.user_id'))
+    assert history['indexes'] == ['ix_orders_user_id_created_at_status']
+    assert not history['temp_sort'] and not history['full_scans']
+
+    # The chatbot's order status lookup never touches the table
+    status = next(report for report in reports if report['statement'].startswith('SELECT orders.id AS orders_id, orders.status'))
+    assert 'COVERING INDEX ix_orders_user_id_created_at_status' in ' '.join(status['plan'])
+
+    assert ('catalog_changes', 'ix_catalog_changes_restaurant_id') in unused
+
+    print('✅ Index advisor test completed successfully!')
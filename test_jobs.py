@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+from models import Base, Job
+
+def test_job_queue_runs_and_retries():
+    """Test that committed jobs run once, failures retry with backoff and give up after max attempts."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    queue = jobs.JobQueue(Session, workers=0)
+    calls = []
+
+    @jobs.task('test_record')
+    def record(value):
+        calls.append(value)
+
+    @jobs.task('test_fail')
+    def fail():
+        raise ValueError('boom')
+
+    db = Session()
+    jobs.enqueue(db, 'test_record', {'value': 1})
+    db.rollback()
+    assert queue.run_pending() == 0  # Rolled back work leaves no jobs
+
+    jobs.enqueue(db, 'test_record', {'value': 1})
+    failing = jobs.enqueue(db, 'test_fail', max_attempts=2)
+    db.commit()
+    failing_id = failing.id
+    db.close()
+
+    assert queue.run_pending() == 2
+    assert calls == [1]
+    assert queue.run_pending() == 0  # The retry waits for its backoff
+
+    db = Session()
+    db.query(Job).filter_by(id=failing_id).update({'run_at': Job.created_at})
+    db.commit()
+    assert queue.run_pending() == 1
+
+    job = db.get(Job, failing_id)
+    db.refresh(job)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert job.last_error == 'ValueError: boom'
+    assert [row.status for row in db.query(Job).order_by(Job.id)] == ['done', 'failed']
+    db.close()
+
+    print('✅ Job queue test completed successfully!')
@@ -0,0 +1,28 @@
+from metrics import Registry
+
+def test_prometheus_rendering():
+    """Test histogram and counter output in the Prometheus text format."""
+
+    registry = Registry()
+    latency = registry.histogram('test_latency_seconds', 'Test latency.', ('endpoint',), buckets=(0.1, 1.0))
+    errors = registry.counter('test_errors_total', 'Test errors.', ('source',))
+    registry.register_cache('intents', lambda: {'hits': 3, 'misses': 1, 'size': 2})
+
+    latency.observe(0.05, 'index')
+    latency.observe(0.5, 'index')
+    latency.observe(5.0, 'index')
+    errors.inc('chatbot')
+
+    text = registry.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{endpoint="index",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{endpoint="index",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{endpoint="index",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{endpoint="index"} 3' in text
+    assert 'test_errors_total{source="chatbot"} 1' in text
+    assert 'portkey_cache_hit_ratio{cache="intents"} 0.75' in text
+
+    print('✅ Metrics rendering test completed successfully!')
+
+if __name__ == '__main__':
+    test_prometheus_rendering()
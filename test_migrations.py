@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+import migrations
+from models import Base
+
+def test_migrations_upgrade_existing_database():
+    """Test that an old database is upgraded in place and a fresh one is stamped at the latest version."""
+
+    workdir = tempfile.mkdtemp()
+    old = create_engine(f"sqlite:///{os.path.join(workdir, 'old.db')}")
+    with old.begin() as conn:
+        migrations.baseline(conn)
+        conn.execute(text("INSERT INTO users (username, email, password_hash, created_at) "
+                          "VALUES ('asha', 'asha@example.com', 'x', '2025-01-01')"))
+
+    assert migrations.migrate(old) == list(range(2, migrations.LATEST + 1))
+    assert migrations.migrate(old) == []
+    assert inspect(old).has_table('catalog_changes')
+    with old.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM users')).scalar() == 1
+        assert migrations.current_version(conn) == migrations.LATEST
+    cart_indexes = {index['name']: index['column_names'] for index in inspect(old).get_indexes('cart_items')}
+    assert cart_indexes['ix_cart_items_menu_item_id'] == ['menu_item_id']  # Menu item deletes and FK checks
+
+    fresh = create_engine(f"sqlite:///{os.path.join(workdir, 'fresh.db')}")
+    migrations.migrate(fresh)
+    assert set(Base.metadata.tables) <= set(inspect(fresh).get_table_names())
+    assert 'applied_at TIMESTAMP' in str(CreateTable(migrations.schema_version).compile(dialect=postgresql.dialect()))
+
+    print('✅ Migration test completed successfully!')
+
+def test_snapshot_restore():
+    """Test cloning a seeded database from a snapshot into files and memory."""
+
+    workdir = tempfile.mkdtemp()
+    source = create_engine(f"sqlite:///{os.path.join(workdir, 'source.db')}")
+    migrations.migrate(source)
+    with source.begin() as conn:
+        conn.execute(text("INSERT INTO restaurants (name, address, contact, operating_hours, cuisine_type) "
+                          "VALUES ('Dollops', 'Manipal', '0820', '9-5', 'Indian')"))
+
+    snapshot = migrations.snapshot(source, os.path.join(workdir, 'snapshot.db'))
+    clone = os.path.join(workdir, 'clone.db')
+    migrations.restore(snapshot, clone)
+    assert sqlite3.connect(clone).execute('SELECT name FROM restaurants').fetchall() == [('Dollops',)]
+
+    with migrations.memory_engine(snapshot).connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM restaurants')).scalar() == 1
+        assert migrations.current_version(conn) == migrations.LATEST
+
+    print('✅ Snapshot test completed successfully!')
@@ -0,0 +1,119 @@
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import order_status
+from index_advisor import record
+from models import Base, Order
+
+def test_order_transitions_publish_on_commit():
+    """Test that valid transitions are published after commit and invalid ones are refused."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    order = Order(user_id=1, total_amount=100, status='confirmed')
+    db.add(order)
+    db.commit()
+
+    subscription = order_status.broker.subscribe(order.id)
+    try:
+        order_status.transition(db, order, 'preparing')
+        assert subscription.empty()  # Nothing is published before the commit
+        db.commit()
+        event = subscription.get_nowait()
+        assert (event['status'], event['previous']) == ('preparing', 'confirmed')
+        assert order.status == 'preparing'
+
+        order_status.transition(db, order, 'ready')
+        db.rollback()
+        assert subscription.empty()
+
+        with pytest.raises(order_status.InvalidTransition):
+            order_status.transition(db, order, 'delivered')
+        with pytest.raises(order_status.InvalidTransition):
+            order_status.transition(db, order, 'teleported')
+
+        # Another writer got there first; our loaded copy still says 'preparing'
+        with engine.begin() as conn:
+            conn.execute(Order.__table__.update().values(status='cancelled'))
+        with pytest.raises(order_status.InvalidTransition):
+            order_status.transition(db, order, 'ready')
+    finally:
+        order_status.broker.unsubscribe(order.id, subscription)
+        db.close()
+
+    assert order_status.broker.subscriber_count() == 0
+    print('✅ Order status test completed successfully!')
+
+def test_order_events_endpoint(monkeypatch):
+    """Test the order event stream, and that streams past the per-worker cap get 503."""
+
+    import app
+    from principal import Principal
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(app, 'ReadSessionLocal', Session)
+    monkeypatch.setattr(app, '_started', True)
+    monkeypatch.setattr(app, 'get_current_user', lambda: Principal(1, 'asha', 'asha@example.com', None))
+    monkeypatch.setattr(app, 'order_event_streams', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(app, 'order_status_poller', order_status.StatusPoller(order_status.broker, Session))
+    db = Session()
+    db.add_all([Order(id=1, user_id=1, total_amount=100, status='delivered'),
+                Order(id=2, user_id=1, total_amount=100, status='preparing'),
+                Order(id=3, user_id=2, total_amount=100, status='delivered')])
+    db.commit()
+    db.close()
+
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    response = client.get('/api/orders/1/events')
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True).startswith('retry: 5000\nid: ')  # Final status: one event, then done
+    response.close()  # As the server does once the stream ends
+    assert client.get('/api/orders/3/events').status_code == 404  # Someone else's order
+
+    live = client.get('/api/orders/2/events')  # Held open, not read
+    busy = client.get('/api/orders/1/events')
+    assert busy.status_code == 503 and busy.headers['Retry-After']
+    live.close()
+    assert order_status.broker.subscriber_count() == 0
+    assert client.get('/api/orders/1/events').status_code == 200
+
+    print('✅ Order events endpoint test completed successfully!')
+
+def test_poller_publishes_other_processes_changes():
+    """Test that one poll publishes changes committed elsewhere to every subscribed order."""
+
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([Order(id=n, user_id=1, total_amount=100, status='confirmed') for n in (1, 2, 3)])
+    db.commit()
+
+    broker = order_status.Broker()
+    poller = order_status.StatusPoller(broker, Session)
+    subscriptions = {order_id: broker.subscribe(order_id) for order_id in (1, 2)}
+    # As another worker would: committed, but never published in this process
+    db.query(Order).filter(Order.id.in_((2, 3))).update({'status': 'preparing', 'updated_at': datetime.utcnow()})
+    db.commit()
+    db.close()
+
+    poller._since = datetime.utcnow()  # Changes from just before the last poll are re-read
+    with record(engine) as statements:
+        assert poller.poll() >= 1
+    assert len(statements) == 1  # One query for all open streams
+    assert subscriptions[2].get_nowait()['status'] == 'preparing'
+    assert all(event['status'] == 'confirmed' for event in list(subscriptions[1].queue))
+    for order_id, subscription in subscriptions.items():
+        broker.unsubscribe(order_id, subscription)
+    assert poller.poll() == 0
+
+    print('✅ Order status poller test completed successfully!')
@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+import pricing
+
+def test_inr_pricing():
+    """Test precomputed INR prices and rate changes."""
+
+    rate = pricing.USD_TO_INR
+    try:
+        pricing.set_exchange_rate('83.0')
+        assert pricing.inr_paise(Decimal('12.00')) == 99600
+        assert pricing.inr_paise(12.5) == 103750
+        assert pricing.line_total_paise('2.50', 3) == 62250
+        assert pricing.paise_to_inr(62250) == Decimal('622.50')
+        assert pricing.format_inr(99600) == '₹996.00'
+
+        # Totals are summed in whole paise, so lines never drift apart from the total
+        lines = [pricing.line_total_paise('0.01', 1) for _ in range(3)]
+        assert sum(lines) == 3 * 83
+
+        # Changing the rate recomputes every known price in bulk
+        pricing.set_exchange_rate('84.5')
+        assert pricing._price_table[Decimal('12.00')] == 101400
+        assert pricing.inr_paise('12.00') == 101400
+    finally:
+        pricing.set_exchange_rate(rate)
+
+    print('✅ Pricing test completed successfully!')
+
+if __name__ == '__main__':
+    test_inr_pricing()
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import principal
+from index_advisor import record
+from models import Base, User
+
+def test_principal_cached_until_account_changes(monkeypatch):
+    """Test that the principal is loaded once, reloaded after forget_user, and gone once the account is."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(principal, 'SessionLocal', Session)
+    monkeypatch.setattr(principal, 'principal_cache', principal.cache.Cache('test-principals'))
+
+    db = Session()
+    user = User(username='asha', email='asha@example.com', password_hash='x')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    with record(engine) as statements:
+        for _ in range(3):
+            current = principal.load_principal(user_id)
+    assert len(statements) == 1
+    assert (current.id, current.username, current.email) == (user_id, 'asha', 'asha@example.com')
+    assert not hasattr(current, 'password_hash')
+    with pytest.raises(AttributeError):
+        current.role = 'admin'  # Slotted
+
+    user.email = 'asha@portkey.example'
+    db.commit()
+    assert principal.load_principal(user_id).email == 'asha@example.com'  # Still cached
+    principal.forget_user(user_id)
+    assert principal.load_principal(user_id).email == 'asha@portkey.example'
+
+    db.delete(user)
+    db.commit()
+    principal.forget_user(user_id)
+    assert principal.load_principal(user_id) is None
+
+    print('✅ Principal cache test completed successfully!')
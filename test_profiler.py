@@ -0,0 +1,72 @@
+import cProfile
+import tempfile
+import time
+
+from flask import Flask
+
+import profiler
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test-key', PROFILE_DIR=tempfile.mkdtemp(), PROFILE_KEEP=2, **config)
+
+    @app.route('/menu')
+    def menu():
+        return 'menu'
+
+    profiler.init_app(app)
+    return app
+
+def test_token_verification():
+    """Test that only unexpired tokens signed with the app's key are accepted."""
+
+    token = profiler.make_token('test-key', ttl=60)
+    assert profiler.verify_token('test-key', token)
+    assert profiler.verify_token(b'test-key', token)
+    assert not profiler.verify_token('other-key', token)
+    expires, _, signature = token.partition('.')
+    assert not profiler.verify_token('test-key', f'{int(expires) + 3600}.{signature}')  # Extended expiry
+    assert not profiler.verify_token('test-key', profiler.make_token('test-key', ttl=-1))  # Expired
+    for bad in (None, '', 'garbage', f'{expires}.', f'.{signature}'):
+        assert not profiler.verify_token('test-key', bad)
+
+    print('✅ Profiler token test completed successfully!')
+
+def test_profile_store_ring():
+    """Test that the store keeps only the newest profiles and rejects odd names."""
+
+    store = profiler.ProfileStore(tempfile.mkdtemp(), keep=2)
+    names = []
+    for _ in range(3):
+        profile = cProfile.Profile()
+        profile.enable()
+        profile.disable()
+        names.append(store.save(profile, 'menu'))
+        time.sleep(0.01)
+    assert [entry['name'] for entry in store.list()] == names[:0:-1]
+    assert not store.is_valid_name('../secrets.prof') and not store.is_valid_name('app.py')
+
+    print('✅ Profile store test completed successfully!')
+
+def test_profile_endpoints_need_token():
+    """Test that profiles are only taken and served for signed requests; others see a 404."""
+
+    app = make_app()
+    client = app.test_client()
+    header = {profiler.PROFILE_HEADER: profiler.make_token('test-key')}
+
+    assert 'X-Portkey-Profile-Id' not in client.get('/menu').headers
+    assert 'X-Portkey-Profile-Id' not in client.get('/menu', headers={profiler.PROFILE_HEADER: 'forged'}).headers
+    name = client.get('/menu', headers=header).headers['X-Portkey-Profile-Id']
+
+    assert client.get('/debug/profiles').status_code == 404
+    assert client.get('/debug/profiles', headers={profiler.PROFILE_HEADER: 'forged'}).status_code == 404
+    assert client.get(f'/debug/profiles/{name}').status_code == 404
+    assert [entry['name'] for entry in client.get('/debug/profiles', headers=header).get_json()] == [name]
+    assert client.get(f'/debug/profiles/{name}', headers=header).status_code == 200
+
+    # Endpoints an admin listed are profiled without a token
+    app = make_app(PROFILE_ENDPOINTS=('menu',))
+    assert 'X-Portkey-Profile-Id' in app.test_client().get('/menu').headers
+
+    print('✅ Profiler endpoint test completed successfully!')
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+from flask import Flask
+
+import ratelimit
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', **config)
+    release = threading.Event()
+
+    @app.route('/cart/add', methods=['POST'])
+    def add_to_cart():
+        return 'added'
+
+    @app.route('/process-payment', methods=['POST'])
+    def process_payment():
+        release.wait(5)
+        return 'paid'
+
+    ratelimit.init_app(app)
+    return app, release
+
+def test_token_bucket_per_client():
+    """Test that each client gets its own burst and refill, in memory and in SQLite."""
+
+    for store in (ratelimit.MemoryStore(), ratelimit.SQLiteStore(os.path.join(tempfile.mkdtemp(), 'limits.db'))):
+        assert [store.take('a', rate=1.0, capacity=3) for _ in range(3)] == [0, 0, 0]
+        assert 0 < store.take('a', rate=1.0, capacity=3) <= 1.0
+        assert store.take('b', rate=1.0, capacity=3) == 0
+
+    app, _ = make_app(RATE_LIMITS={'add_to_cart': (0.001, 2, 'ip')})
+    client = app.test_client()
+    assert [client.post('/cart/add').status_code for _ in range(3)] == [200, 200, 429]
+    response = client.post('/cart/add', headers={'Accept': 'application/json'})
+    assert response.status_code == 429 and int(response.headers['Retry-After']) > 0
+    assert client.get('/cart/add').status_code == 405  # Only writes are limited
+
+    print('✅ Rate limit test completed successfully!')
+
+def test_load_shedding():
+    """Test that requests beyond the in-flight cap are refused with 503."""
+
+    app, release = make_app(MAX_IN_FLIGHT=1, RATE_LIMITS={'process_payment': (100.0, 100, 'ip')})
+    first = threading.Thread(target=lambda: app.test_client().post('/process-payment'))
+    first.start()
+    try:
+        for _ in range(100):
+            if app.extensions['load_shedder'].in_flight() == 1:
+                break
+            threading.Event().wait(0.01)
+        response = app.test_client().post('/process-payment')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        first.join()
+    assert app.test_client().post('/process-payment').status_code == 200
+
+    print('✅ Load shedding test completed successfully!')
+
+def test_fails_open_and_trusts_configured_proxies():
+    """Test that a locked bucket store lets requests through and proxied clients get their own buckets."""
+
+    path = os.path.join(tempfile.mkdtemp(), 'limits.db')
+    app, _ = make_app(RATE_LIMIT_DB=path, RATE_LIMITS={'add_to_cart': (0.001, 1, 'ip')})
+    client = app.test_client()
+    assert client.post('/cart/add').status_code == 200
+    lock = sqlite3.connect(path, isolation_level=None)
+    lock.execute('BEGIN EXCLUSIVE')
+    try:
+        assert client.post('/cart/add').status_code == 200  # Would be 429 if the store answered
+    finally:
+        lock.execute('ROLLBACK')
+        lock.close()
+
+    app, _ = make_app(PROXY_COUNT=1, RATE_LIMITS={'add_to_cart': (0.001, 1, 'ip')})
+    client = app.test_client()
+    forwarded = lambda address: client.post('/cart/add', headers={'X-Forwarded-For': address}).status_code
+    assert [forwarded('10.0.0.1'), forwarded('10.0.0.2'), forwarded('10.0.0.1')] == [200, 200, 429]
+
+    print('✅ Rate limit fail-open test completed successfully!')
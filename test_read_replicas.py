@@ -0,0 +1,43 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+import db
+from models import Restaurant
+
+def test_read_routing_and_stickiness():
+    """Test that reads go to replicas in turn, stick to the primary after a write, and never write."""
+
+    replicas = [create_engine('sqlite://'), create_engine('sqlite://')]
+    original = db.replica_engines
+    db.replica_engines = replicas
+    try:
+        db.stick_to_primary(0.0)
+        picked = {db.read_engine() for _ in range(4)}
+        assert picked == set(replicas)
+
+        until = db.stick_to_primary()
+        assert until > time.time()
+        assert read_session_bind() is db.engine
+
+        db.stick_to_primary(0.0)
+        assert read_session_bind() in replicas
+
+        session = db.ReadSessionLocal()
+        session.add(Restaurant(name='x', address='x', contact='x', operating_hours='x', cuisine_type='x'))
+        with pytest.raises(RuntimeError):
+            session.flush()
+        session.close()
+    finally:
+        db.replica_engines = original
+        db.stick_to_primary(0.0)
+
+    print('✅ Read replica routing test completed successfully!')
+
+def read_session_bind():
+    session = db.ReadSessionLocal()
+    try:
+        return session.get_bind()
+    finally:
+        session.close()
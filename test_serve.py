@@ -0,0 +1,40 @@
+import serve
+
+def test_gunicorn_options():
+    """Test that command line flags map onto gunicorn settings with warm-up hooks."""
+
+    args = serve.parse_args(['--bind', '127.0.0.1:8000', '--workers', '3', '--threads', '8', '--max-requests', '1000'])
+    options = serve.gunicorn_options(args)
+    assert options['bind'] == '127.0.0.1:8000'
+    assert (options['workers'], options['threads'], options['worker_class']) == (3, 8, 'gthread')
+    assert options['preload_app'] and options['max_requests_jitter'] == 100
+    assert options['post_worker_init'] is serve._warm_worker
+
+    options = serve.gunicorn_options(serve.parse_args(['--no-preload', '--no-warm-up']))
+    assert not options['preload_app']
+    assert options['post_worker_init'] is serve._start_worker
+    assert serve.default_workers() >= 3
+
+    options = serve.gunicorn_options(serve.parse_args(['--events', '--connections', '2000']))
+    assert (options['worker_class'], options['worker_connections']) == ('gevent', 2000)
+    assert not options['preload_app']  # Imported after gevent patches each worker
+
+    print('✅ Serve options test completed successfully!')
+
+def test_preload_migrates_once(monkeypatch):
+    """Test that workers forked from a preloaded master start their jobs without migrating again."""
+
+    import app
+    from db import engine
+    runs = []
+    monkeypatch.setattr(app, 'ensure_schema', lambda: runs.append(1))
+    monkeypatch.setattr(app, '_migrated', False)
+    monkeypatch.setattr(app, '_started', False)
+    monkeypatch.setattr(app.jobs, 'WORKERS', 0)
+    monkeypatch.setattr(engine, 'dispose', lambda: None)
+
+    assert serve.load_app(preload=True) is app.app
+    app.start_services()  # As post_worker_init does in each worker
+    assert runs == [1] and app._started
+
+    print('✅ Preload migration test completed successfully!')
@@ -0,0 +1,136 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import migrations
+import shopping_cart
+from index_advisor import record
+from models import Base, CartItem
+
+def test_add_item_upserts_one_line(add_menu_item):
+    """Test that repeated adds merge into one capped cart line with one statement each."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    item = add_menu_item(db, stock_quantity=30)
+
+    with record(engine) as statements:
+        for _ in range(3):
+            shopping_cart.add_item(db, item, 4, user_id=7)
+            db.commit()
+    assert len([s for s in statements if 'cart_items' in s['statement']]) == 3
+    shopping_cart.add_item(db, item, 2, session_id='anon')
+    shopping_cart.add_item(db, item, 15, user_id=7)
+    db.commit()
+    lines = {(line.user_id, line.session_id): line.quantity for line in db.query(CartItem)}
+    assert lines == {(7, None): shopping_cart.MAX_QUANTITY, (None, 'anon'): 2}
+
+    assert shopping_cart.reserve_stock(db, item, 30)
+    assert not shopping_cart.reserve_stock(db, item, 1)  # Nothing left to oversell
+    db.commit()
+    db.refresh(item)
+    assert item.stock_quantity == 0
+
+    print('✅ Cart upsert test completed successfully!')
+
+def test_set_and_remove_move_stock(add_menu_item):
+    """Test that changing or removing a line gives stock back and totals follow the lines."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    item = add_menu_item(db, price=1.0, stock_quantity=10)
+
+    assert shopping_cart.reserve_stock(db, item, 4)
+    shopping_cart.add_item(db, item, 4, session_id='anon')
+    db.commit()
+    assert shopping_cart.set_quantity(db, item, 1, session_id='anon')[0] == 1
+    assert shopping_cart.set_quantity(db, item, 2, session_id='other') is None
+    with pytest.raises(shopping_cart.CartConflict):
+        shopping_cart.set_quantity(db, item, 20, session_id='anon')  # 16 more, only 6 in stock
+    db.rollback()  # Back to the committed line of 4
+
+    lines = shopping_cart.lines(db, session_id='anon')
+    assert lines == [{'menu_item_id': item.id, 'quantity': 4, 'unit_price_inr_paise': 8300,
+                      'subtotal_inr_paise': 33200}]
+    assert shopping_cart.totals(lines) == {'count': 1, 'total_inr_paise': 33200}
+
+    assert shopping_cart.remove_item(db, item, session_id='anon')
+    assert not shopping_cart.remove_item(db, item, session_id='anon')
+    db.commit()
+    db.refresh(item)
+    assert item.stock_quantity == 10 and shopping_cart.lines(db, session_id='anon') == []
+
+    print('✅ Cart update test completed successfully!')
+
+def test_adding_past_the_cap_keeps_stock(add_menu_item):
+    """Test that stock taken for quantity beyond the line cap goes back, so removing the line restores it all."""
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    item = add_menu_item(db)
+
+    db.refresh(item)  # Loaded, as the route loads it
+    with record(engine) as statements:
+        assert shopping_cart.reserve_and_add(db, item, 18, user_id=3)[0] == 18
+        assert shopping_cart.reserve_and_add(db, item, 5, user_id=3)[0] == shopping_cart.MAX_QUANTITY
+        assert shopping_cart.reserve_and_add(db, item, 4, user_id=3)[0] == shopping_cart.MAX_QUANTITY
+    assert [s['statement'].split()[0] for s in statements] == ['UPDATE', 'INSERT'] * 3  # Stock, then the line
+    db.commit()
+    db.refresh(item)
+    assert item.stock_quantity == 100 - shopping_cart.MAX_QUANTITY
+
+    assert shopping_cart.reserve_and_add(db, item, 200, user_id=3)[0] == shopping_cart.MAX_QUANTITY  # Takes none
+    assert shopping_cart.reserve_stock(db, item, 75)
+    assert shopping_cart.reserve_and_add(db, item, 6, user_id=4) is None  # Short of stock, nothing taken
+    shopping_cart.release_stock(db, item, 75)
+    assert shopping_cart.remove_item(db, item, user_id=3)
+    db.commit()
+    db.refresh(item)
+    assert item.stock_quantity == 100
+
+    print('✅ Cart cap stock test completed successfully!')
+
+def test_migration_merges_duplicate_lines():
+    """Test that upgrading folds duplicate cart lines into one before adding the unique index."""
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'old.db')}")
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text('DROP INDEX ix_cart_items_user_id_menu_item_id'))
+        unique_version = migrations.MIGRATIONS.index(migrations.unique_cart_lines) + 1
+        conn.execute(text('DELETE FROM schema_version WHERE version >= :version'), {'version': unique_version})
+        for quantity in (3, 12, 9):
+            conn.execute(text("INSERT INTO cart_items (user_id, menu_item_id, quantity, unit_price, created_at) "
+                              "VALUES (1, 5, :quantity, 2.5, '2025-01-01')"), {'quantity': quantity})
+
+    assert migrations.migrate(engine) == list(range(unique_version, migrations.LATEST + 1))
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT id, quantity FROM cart_items')).all() == [(1, 20)]
+
+    print('✅ Cart migration test completed successfully!')
+
+def test_baseline_upgrade_merges_duplicate_lines():
+    """Test that a database from before migrations, with duplicate cart lines, upgrades all the way."""
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'baseline.db')}")
+    with engine.begin() as conn:
+        migrations.baseline(conn)
+        for owner in ('user_id', 'session_id'):  # Built from today's models; old databases lack these
+            conn.execute(text(f'DROP INDEX ix_cart_items_{owner}_menu_item_id'))
+        for user_id, quantity in ((1, 3), (1, 4), (None, 2)):
+            conn.execute(text("INSERT INTO cart_items (user_id, session_id, menu_item_id, quantity, unit_price, "
+                              "created_at) VALUES (:user_id, 'anon', 5, :quantity, 2.5, '2025-01-01')"),
+                         {'user_id': user_id, 'quantity': quantity})
+
+    assert migrations.migrate(engine) == list(range(2, migrations.LATEST + 1))
+    with engine.connect() as conn:
+        # The user's two lines merge first; the session line then folds into the survivor
+        assert conn.execute(text('SELECT COUNT(*), SUM(quantity) FROM cart_items')).one() == (1, 9)
+
+    print('✅ Baseline cart migration test completed successfully!')
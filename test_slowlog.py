@@ -0,0 +1,76 @@
+import time
+
+from sqlalchemy import create_engine, text
+
+import slowlog
+
+def make_engine(monkeypatch, **options):
+    entries = []
+    monkeypatch.setattr(slowlog, 'write_entry', entries.append)
+    engine = slowlog.install(create_engine('sqlite://'), **options)
+    return engine, entries
+
+def test_threshold_sampling_and_rate_limit(monkeypatch):
+    """Test that only sampled statements over the threshold are logged, at most max_per_minute."""
+
+    engine, entries = make_engine(monkeypatch, threshold_ms=60000)
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert entries == []  # Fast
+
+    engine, entries = make_engine(monkeypatch, threshold_ms=0, sample_rate=0.0)
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert entries == []  # Not sampled
+
+    engine, entries = make_engine(monkeypatch, threshold_ms=0, sample_rate=1.0, max_per_minute=2)
+    with engine.connect() as conn:
+        conn.execute(text('CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)'))
+        for n in range(4):
+            conn.execute(text('SELECT id FROM users WHERE id = :id'), {'id': n})
+    assert len(entries) == 2
+    assert entries[0]['plan'] is None  # CREATE TABLE isn't explained
+    assert entries[1]['parameters'] == (0,) and entries[1]['plan']
+
+    limiter = slowlog.RateLimiter(1, period=0.05)
+    assert limiter.allow() and not limiter.allow()
+    time.sleep(0.06)
+    assert limiter.allow()  # A new window
+
+    print('✅ Slow query gate test completed successfully!')
+
+def test_redaction():
+    """Test that parameters of statements touching sensitive columns are hidden."""
+
+    for column in ('password_hash', 'reset_token', 'client_secret', 'email'):
+        assert slowlog.redact(f'SELECT id FROM users WHERE {column} = ?', ('x',)) == '<redacted>'
+    assert slowlog.redact('SELECT id FROM menu_items WHERE id = ?', (3,)) == (3,)
+
+    print('✅ Slow query redaction test completed successfully!')
+
+def test_explain_failure_keeps_transaction():
+    """Test that a failing EXPLAIN on Postgres rolls back only to its savepoint."""
+
+    executed = []
+
+    class Cursor:
+        connection = None
+
+        def execute(self, statement, parameters=None):
+            executed.append(statement)
+            if statement.startswith('EXPLAIN'):
+                raise RuntimeError('syntax error')
+
+        def close(self):
+            pass
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+    Cursor.connection = Connection()
+    plan = slowlog.explain(Cursor(), 'postgresql', 'SELECT 1', ())
+    assert plan == ['EXPLAIN failed: syntax error']
+    assert executed == ['SAVEPOINT slowlog_explain', 'EXPLAIN SELECT 1', 'ROLLBACK TO SAVEPOINT slowlog_explain']
+
+    print('✅ Slow query EXPLAIN test completed successfully!')
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+IMPORT_BUDGET_SECONDS = 3.0  # Generous; a worker boot is mostly Flask and SQLAlchemy imports
+
+CHECK = """
+import json, threading, time
+started = time.perf_counter()
+import app, chatbot
+print(json.dumps({'seconds': time.perf_counter() - started, 'chatbot_built': chatbot._chatbot is not None,
+                  'threads': [t.name for t in threading.enumerate()]}))
+"""
+
+def test_import_is_lazy_and_fast():
+    """Test that importing the app stays within budget without touching the database or starting workers."""
+
+    workdir = tempfile.mkdtemp()
+    database = os.path.join(workdir, 'lazy.db')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', PORTKEY_JOB_WORKERS='2')
+    output = subprocess.run([sys.executable, '-c', CHECK], env=env, capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result['seconds'] < IMPORT_BUDGET_SECONDS
+    assert not result['chatbot_built']
+    assert not any(name.startswith('portkey-jobs') for name in result['threads'])
+    assert not os.path.exists(database)  # No connection until the first request
+
+    print('✅ Startup test completed successfully!')